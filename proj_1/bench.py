@@ -0,0 +1,240 @@
+import argparse
+import json
+import platform
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+from utils import Environment, Robot
+from kernels import train_fast
+from main import train, train_multiple_runs
+
+
+# parâmetros do ambiente usados em todos os casos (os mesmos do __main__ de main.py)
+ENV_PARAMS = {"alpha": 0.3, "beta": 0.2, "r_s": 3.5, "r_w": 0.5}
+
+
+class Probe:
+    def __init__(self, trace: bool = False) -> None:
+        """Context manager around the measured part of a case: its time and, when tracing, its allocations
+
+        With trace=True (tracemalloc running) it compares tracemalloc snapshots taken before
+        and after the measured part, so `blocks` and `size` are the memory blocks and bytes
+        allocated in it and still alive at its end. Taking the snapshots is not timed.
+
+        Args:
+            trace (bool): take tracemalloc snapshots around the measured part.
+        """
+        self.trace = trace
+        self.seconds = 0.0
+        self.blocks = 0
+        self.size = 0
+
+    def _snapshot(self) -> tracemalloc.Snapshot:
+        # exclui as alocações do próprio tracemalloc
+        return tracemalloc.take_snapshot().filter_traces([tracemalloc.Filter(False, tracemalloc.__file__)])
+
+    def __enter__(self) -> "Probe":
+        self.before = self._snapshot() if self.trace else None
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.seconds = time.perf_counter() - self.start
+        if self.trace:
+            stats = self._snapshot().compare_to(self.before, "filename")
+            self.blocks = sum(stat.count_diff for stat in stats)
+            self.size = sum(stat.size_diff for stat in stats)
+            self.before = None
+
+
+def bench_env_step(n: int, probe: Probe) -> int:
+    """n calls to Environment.step, alternating search/wait"""
+    robot = Robot(capacity=n + 1)
+    env = Environment(ENV_PARAMS["alpha"], ENV_PARAMS["beta"], ENV_PARAMS["r_s"], ENV_PARAMS["r_w"], robot)
+    actions = ["search", "wait"]
+    with probe:
+        for j in range(n):
+            env.step(state=robot.state, action=actions[j & 1])
+    return n
+
+
+def bench_robot_act(n: int, probe: Probe) -> int:
+    """n calls to Robot.act from a fixed state"""
+    robot = Robot(capacity=n + 1)
+    with probe:
+        for _ in range(n):
+            robot.act()
+    return n
+
+
+def bench_robot_backup(n: int, probe: Probe) -> int:
+    """One Robot.backup over an epoch of n recorded transitions (filling it isn't measured)"""
+    robot = Robot(capacity=n + 1)
+    env = Environment(ENV_PARAMS["alpha"], ENV_PARAMS["beta"], ENV_PARAMS["r_s"], ENV_PARAMS["r_w"], robot)
+    for _ in range(n):
+        env.step(state=robot.state, action=robot.act())
+    with probe:
+        robot.backup()
+    return n
+
+
+def bench_train(epochs: int, steps: int, probe: Probe) -> int:
+    """Full train(epochs, steps) run"""
+    with probe:
+        train(epochs, steps, **ENV_PARAMS, save_policy=False, verbose=False)
+    return epochs * steps
+
+
+def bench_train_fast(epochs: int, steps: int, probe: Probe) -> int:
+    """Full train_fast(epochs, steps) run (numba kernel, or the same kernel as plain python)"""
+    with probe:
+        train_fast(epochs, steps, **ENV_PARAMS)
+    return epochs * steps
+
+
+def bench_train_multiple_runs(epochs: int, steps: int, num_runs: int, probe: Probe) -> int:
+    """train_multiple_runs over num_runs agents"""
+    params = {"epochs": epochs, "steps": steps, **ENV_PARAMS, "verbose": False}
+    with probe:
+        train_multiple_runs(params, num_runs)
+    return epochs * steps * num_runs
+
+
+# nome -> (função, argumentos) para cada escala
+CASES = {
+    "small": {
+        "env_step": (bench_env_step, (100_000,)),
+        "robot_act": (bench_robot_act, (100_000,)),
+        "robot_backup": (bench_robot_backup, (100_000,)),
+        "train_10x1000": (bench_train, (10, 1000)),
+        "train_fast_10x1000": (bench_train_fast, (10, 1000)),
+        "multiple_runs_10x20x1000": (bench_train_multiple_runs, (20, 1000, 10)),
+    },
+    "large": {
+        "env_step": (bench_env_step, (1_000_000,)),
+        "robot_act": (bench_robot_act, (1_000_000,)),
+        "robot_backup": (bench_robot_backup, (1_000_000,)),
+        "train_100x1000": (bench_train, (100, 1000)),
+        "train_fast_100x1000": (bench_train_fast, (100, 1000)),
+        "multiple_runs_10x100x1000": (bench_train_multiple_runs, (100, 1000, 10)),
+        "multiple_runs_1000x20x1000": (bench_train_multiple_runs, (20, 1000, 1000)),
+    },
+}
+
+
+def run_case(fn, args: tuple, repeat: int = 3) -> dict:
+    """Time a case (best of `repeat`) and measure its memory in a separate traced run
+
+    Args:
+        fn (callable): benchmark function taking (*args, probe) and returning the steps
+            performed; the part it runs inside the probe is what gets measured.
+        args (tuple): arguments for fn.
+        repeat (int): timed repetitions.
+
+    Returns:
+        dict: steps, seconds, steps_per_sec, peak_mem_kb (whole traced run, setup included),
+            and allocs_per_step / alloc_bytes_per_step (blocks and bytes allocated by the measured
+            part and still alive at its end, per step: per-step growth, not a preallocated buffer).
+    """
+    best = np.inf
+    for _ in range(repeat):
+        probe = Probe()
+        steps = fn(*args, probe)
+        best = min(best, probe.seconds)
+
+    # tracemalloc deixa o código mais lento, então a memória é medida numa execução à parte
+    tracemalloc.start()
+    probe = Probe(trace=True)
+    fn(*args, probe)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "steps": steps,
+        "seconds": best,
+        "steps_per_sec": steps / best,
+        "peak_mem_kb": peak / 1024,
+        "allocs_per_step": probe.blocks / steps,
+        "alloc_bytes_per_step": probe.size / steps,
+    }
+
+
+def compare(results: dict, baseline: dict, tolerance: float, alloc_slack: float = 0.01) -> list[str]:
+    """Cases whose throughput fell more than `tolerance` below the baseline, or whose allocations grew
+
+    Allocations per step count as a regression above baseline * (1 + tolerance) + alloc_slack,
+    the slack keeping cases that allocate nothing per step from failing on a stray block.
+
+    Args:
+        results (dict): case name -> metrics of this run.
+        baseline (dict): case name -> metrics of the stored baseline.
+        tolerance (float): allowed relative slowdown (0.2 = 20%) and allocation growth.
+        alloc_slack (float): allowed absolute growth of allocs_per_step.
+
+    Returns:
+        list[str]: one message per regression.
+    """
+    regressions = []
+    for name, metrics in results.items():
+        if name not in baseline:
+            continue
+        ratio = metrics["steps_per_sec"] / baseline[name]["steps_per_sec"]
+        if ratio < 1 - tolerance:
+            regressions.append(f"{name}: {metrics['steps_per_sec']:.0f} steps/s is {1 - ratio:.0%} below "
+                               f"baseline {baseline[name]['steps_per_sec']:.0f} steps/s")
+        # baselines antigos não têm alocações por passo
+        if "allocs_per_step" in baseline[name]:
+            allowed = baseline[name]["allocs_per_step"] * (1 + tolerance) + alloc_slack
+            if metrics["allocs_per_step"] > allowed:
+                regressions.append(f"{name}: {metrics['allocs_per_step']:.3f} allocations/step, baseline "
+                                   f"{baseline[name]['allocs_per_step']:.3f}")
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmarks for the recycling robot training hot path")
+    parser.add_argument("--scale", choices=list(CASES), default="small")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--out", default="bench_results.json")
+    parser.add_argument("--baseline", default="bench_baseline.json")
+    parser.add_argument("--save-baseline", action="store_true", help="store this run as the baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed slowdown vs baseline")
+    args = parser.parse_args()
+
+    results = {}
+    for name, (fn, fn_args) in CASES[args.scale].items():
+        results[name] = run_case(fn, fn_args, args.repeat)
+        m = results[name]
+        print(f"{name:<28} {m['steps_per_sec']:>14,.0f} steps/s {m['peak_mem_kb']:>12,.1f} KiB peak "
+              f"{m['allocs_per_step']:>8,.3f} allocs/step {m['alloc_bytes_per_step']:>8,.1f} B/step")
+
+    report = {
+        "scale": args.scale,
+        "python": sys.version.split()[0],
+        "numpy": np.__version__,
+        "machine": platform.machine(),
+        "cases": results,
+    }
+    with open(args.out, "w") as f:
+        json.dump(report, f, indent=2)
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"baseline saved to {args.baseline}")
+    else:
+        try:
+            with open(args.baseline) as f:
+                baseline = json.load(f)
+        except FileNotFoundError:
+            print(f"no baseline at {args.baseline} (run with --save-baseline to create one)")
+        else:
+            if baseline["scale"] != args.scale:
+                sys.exit(f"baseline is for scale '{baseline['scale']}', not '{args.scale}'")
+            regressions = compare(results, baseline["cases"], args.tolerance)
+            if regressions:
+                sys.exit("PERFORMANCE REGRESSION\n" + "\n".join(regressions))
+            print("no regressions vs baseline")
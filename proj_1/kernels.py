@@ -0,0 +1,227 @@
+import numpy as np
+
+try:
+    from numba import njit
+    HAVE_NUMBA = True
+except ImportError:
+    HAVE_NUMBA = False
+
+    def njit(*args, **kwargs):
+        """Stand-in for numba.njit when numba isn't installed (kernels run as plain python)"""
+        if len(args) == 1 and callable(args[0]):
+            return args[0]
+        return lambda f: f
+
+
+ACTIONS = ["search", "wait", "recharge"]
+
+
+@njit(cache=True)
+def _backup(q, states, actions, rewards, start, end, lr):
+    """Q-learning updates for transitions [start, end) of the epoch buffers (state index 0 low, 1 high)"""
+    for k in range(start, end):
+        s = states[k]
+        a = actions[k]
+        # encontra Q-value máximo em cada caso possível
+        if states[k + 1] == 1:
+            max_next_q = max(q[1, 0], q[1, 1])
+        else:
+            max_next_q = max(q[0, 0], max(q[0, 1], q[0, 2]))
+        q[s, a] += lr * (rewards[k] + max_next_q - q[s, a])
+
+
+@njit(cache=True)
+def _run_epoch(q, states, actions, rewards, u, alpha, beta, r_s, r_w, epsilon, lr, backup_every):
+    """One epoch of act + env step + TD backup fused in a single loop
+
+    Same semantics as `train`: ε-greedy with random tie-breaking and the invalid recharge
+    mask, backups after step `backup_every` (and its multiples) and at the end of the epoch.
+
+    Args:
+        q (np.ndarray): Q-value table (2, 3), updated in place.
+        states, actions, rewards (np.ndarray): epoch buffers of size steps + 1, steps, steps.
+        u (np.ndarray): uniform draws, shape (steps, 3): ε test, action pick, env outcome.
+
+    Returns:
+        float: total reward of the epoch.
+    """
+    steps = u.shape[0]
+    state = 1 # começa com bateria alta
+    states[0] = state
+    applied = 0
+    total = 0.0
+    for j in range(steps):
+        n_valid = 2 if state == 1 else 3
+        a = 0
+        if u[j, 0] < epsilon:
+            a = int(u[j, 1] * n_valid)
+        else:
+            # ação gulosa com desempate aleatório entre os máximos
+            best = q[state, 0]
+            for b in range(1, n_valid):
+                best = max(best, q[state, b])
+            n_best = 0
+            for b in range(n_valid):
+                if q[state, b] == best:
+                    n_best += 1
+            rank = int(u[j, 1] * n_best)
+            for b in range(n_valid):
+                if q[state, b] == best:
+                    if rank == 0:
+                        a = b
+                        break
+                    rank -= 1
+
+        # transição do ambiente
+        next_state = state
+        if state == 1:
+            if a == 0:
+                reward = r_s
+                if u[j, 2] >= alpha:
+                    next_state = 0
+            else:
+                reward = r_w
+        else:
+            if a == 0:
+                if u[j, 2] < beta:
+                    reward = r_s
+                else:
+                    reward = -3.0
+                    next_state = 1
+            elif a == 1:
+                reward = r_w
+            else:
+                reward = 0.0
+                next_state = 1
+
+        actions[j] = a
+        rewards[j] = reward
+        states[j + 1] = next_state
+        total += reward
+        state = next_state
+
+        if backup_every == 1 or (j % backup_every == 0 and j > 0):
+            _backup(q, states, actions, rewards, applied, j + 1, lr)
+            applied = j + 1
+
+    # backup ao final de uma epoch
+    _backup(q, states, actions, rewards, applied, steps, lr)
+    return total
+
+
+def train_fast(epochs: int, steps: int, alpha: float, beta: float, r_s: float, r_w: float,
+               epsilon: float = 0.001, lr: float = 0.1, backup_every: int = 200,
+               rng: np.random.Generator | None = None) -> tuple[list[float], dict[str, int], np.ndarray]:
+    """Compiled fast path for `train`, one fused kernel call per epoch
+
+    Runs the numba kernel when numba is installed; otherwise the same kernel runs as plain
+    python, about as fast as `train`. Does not write to the policy store.
+
+    Args:
+        epochs (int): number of epochs.
+        steps (int): steps per epoch.
+        alpha (float): probability of battery staying high after searching.
+        beta (float): probability of battery staying low after searching.
+        r_s (float): reward for searching.
+        r_w (float): reward for waiting.
+        epsilon (float): epsilon for the epsilon-greedy policy.
+        lr (float): learning rate for TD updates.
+        backup_every (int): steps between TD backups (1 for online updates).
+        rng (np.random.Generator, optional): random generator for all draws.
+
+    Returns:
+        rewards (list[float]): total rewards per epoch.
+        action_count (dict[str, int]): count of each action taken.
+        optimal_policy (np.ndarray): learned Q-value table.
+    """
+    return train_kernel(epochs, steps, alpha, beta, r_s, r_w, epsilon, lr, backup_every, rng,
+                        compiled=HAVE_NUMBA)
+
+
+def train_kernel(epochs: int, steps: int, alpha: float, beta: float, r_s: float, r_w: float,
+                 epsilon: float = 0.001, lr: float = 0.1, backup_every: int = 200,
+                 rng: np.random.Generator | None = None,
+                 compiled: bool = True) -> tuple[list[float], dict[str, int], np.ndarray]:
+    """Train with the fused `_run_epoch` kernel, compiled or as plain python
+
+    Args:
+        epochs, steps, alpha, beta, r_s, r_w, epsilon, lr, backup_every: as in `train_fast`.
+        rng (np.random.Generator, optional): random generator for all draws.
+        compiled (bool): use the numba-compiled kernel; False runs the same code uncompiled
+            (always the case without numba).
+
+    Returns:
+        rewards (list[float]): total rewards per epoch.
+        action_count (dict[str, int]): count of each action taken.
+        optimal_policy (np.ndarray): learned Q-value table.
+    """
+    rng = rng if rng is not None else np.random.default_rng()
+    # py_func é a função python original por trás do dispatcher do numba
+    run_epoch = _run_epoch if compiled else getattr(_run_epoch, "py_func", _run_epoch)
+    q = np.ones(shape=(2, 3))
+    q[1, 2] = 0
+    states = np.empty(steps + 1, dtype=np.int64)
+    actions = np.empty(steps, dtype=np.int64)
+    rewards_buffer = np.empty(steps)
+    counts = np.zeros(3, dtype=np.int64)
+    rewards: list[float] = []
+    for _ in range(epochs):
+        u = rng.random((steps, 3))
+        rewards.append(run_epoch(q, states, actions, rewards_buffer, u, alpha, beta, r_s, r_w,
+                                 epsilon, lr, backup_every))
+        counts += np.bincount(actions, minlength=3)
+    return rewards, dict(zip(ACTIONS, counts.tolist())), q
+
+
+def parity_check(num_runs: int = 20, epochs: int = 100, steps: int = 1000, params: dict | None = None,
+                 z: float = 4.0, seed: int = 0) -> None:
+    """Check that `train_fast` and the `_run_epoch` kernel reproduce the reward curves of `train` statistically
+
+    Compares the per-run mean reward over the second half of training and the total
+    action frequencies of each implementation against `train`, and raises AssertionError
+    if they differ by more than z standard errors. The kernel is always checked as plain
+    python, so its logic is covered even where numba (and so the compiled path of
+    `train_fast`) is unavailable.
+
+    Args:
+        num_runs (int): independent runs per implementation.
+        epochs (int): epochs per run.
+        steps (int): steps per epoch.
+        params (dict, optional): alpha, beta, r_s, r_w (defaults to the values in main.py).
+        z (float): tolerance in standard errors.
+        seed (int): root seed; every run gets its own spawned stream.
+    """
+    from main import train
+
+    params = params or {"alpha": 0.3, "beta": 0.2, "r_s": 3.5, "r_w": 0.5}
+    ref_seeds, *impl_seeds = np.random.SeedSequence(seed).spawn(3)
+    ref_runs = [train(epochs, steps, **params, save_policy=False, verbose=False, seed=s)
+                for s in ref_seeds.spawn(num_runs)]
+    implementations = {
+        "train_fast": lambda rng: train_fast(epochs, steps, **params, rng=rng),
+        "kernel (python)": lambda rng: train_kernel(epochs, steps, **params, rng=rng, compiled=False),
+    }
+
+    def summarize(runs: list) -> tuple[np.ndarray, np.ndarray]:
+        # recompensa média da segunda metade e frequência de cada ação, por run
+        rewards = np.array([np.mean(r[epochs // 2:]) for r, _, _ in runs])
+        freqs = np.array([[c[a] for a in ACTIONS] for _, c, _ in runs]) / (epochs * steps)
+        return rewards, freqs
+
+    ref_rewards, ref_freqs = summarize(ref_runs)
+    means = {"train": ref_rewards.mean()}
+    for (name, run), seeds in zip(implementations.items(), impl_seeds):
+        runs = [run(np.random.default_rng(s)) for s in seeds.spawn(num_runs)]
+        rewards, freqs = summarize(runs)
+        stderr = np.sqrt(ref_rewards.var() / num_runs + rewards.var() / num_runs) + 1e-9
+        diff = abs(ref_rewards.mean() - rewards.mean())
+        assert diff <= z * stderr, f"{name}: mean reward differs by {diff:.2f} (> {z} x {stderr:.2f})"
+        freq_stderr = np.sqrt(ref_freqs.var(axis=0) / num_runs + freqs.var(axis=0) / num_runs) + 1e-9
+        freq_diff = np.abs(ref_freqs.mean(axis=0) - freqs.mean(axis=0))
+        assert np.all(freq_diff <= z * freq_stderr), f"{name}: action frequencies differ: {freq_diff} (stderr {freq_stderr})"
+        means[name] = rewards.mean()
+    print(f"parity ok (numba: {HAVE_NUMBA}) | " + " | ".join(f"{name}: {mean:.1f}" for name, mean in means.items()))
+
+
+if __name__ == "__main__":
+    parity_check()
@@ -1,9 +1,15 @@
 from utils import *
-from viz import *
+from stopping import EarlyStopping
+from metrics import MetricsWriter
 import numpy as np
 
 
-def train(epochs: int, steps: int, alpha: float, beta: float, r_s: float, r_w: float, save: bool = False) -> tuple[list[float], dict[str, int], np.ndarray]:
+def train(epochs: int, steps: int, alpha: float, beta: float, r_s: float, r_w: float, save: bool = False,
+          online: bool = False, epsilon: float = 0.001, lr: float = 0.1, save_policy: bool = True,
+          verbose: bool = True, early_stopping: EarlyStopping | None = None,
+          metrics: MetricsWriter | None = None, seed: int | np.random.SeedSequence | None = None,
+          mdp: TabularMDP | None = None, gamma: float = 1.0, lam: float = 0.0, n_step: int = 1,
+          trace: str | None = None) -> tuple[list[float], dict[str, int], np.ndarray]:
     """runs training session for the recycling robot RL agent
     
     Args:
@@ -13,23 +19,53 @@ def train(epochs: int, steps: int, alpha: float, beta: float, r_s: float, r_w: f
         beta (float): probability of battery staying low after searching.
         r_s (float): reward for searching.
         r_w (float): reward for waiting.
+        save (bool): write rewards.txt after training.
+        online (bool): apply Q-learning updates every step instead of in periodic backups.
+        epsilon (float): epsilon for the agent's epsilon-greedy policy.
+        lr (float): learning rate for the agent's TD updates.
+        save_policy (bool): write the learned Q-table to the policy.npy store.
+        verbose (bool): print training progress.
+        early_stopping (EarlyStopping, optional): ends training once its criteria fire; the
+            epoch at which it stopped is left in `early_stopping.stopped_epoch`.
+        metrics (MetricsWriter, optional): streams each epoch's reward, action counts and
+            Q-table to a binary log while training.
+        seed (int or np.random.SeedSequence, optional): seed of the run; the env and the agent
+            get independent generators spawned from it, so a seed reproduces the run exactly.
+        mdp (TabularMDP, optional): train on this mdp instead of the 2-level robot (alpha, beta,
+            r_s and r_w are then only stored as metadata). Metrics and the policy store keep
+            (2, 3) tables, so with other shapes `metrics` is rejected and the policy isn't saved.
+        gamma (float): discount factor of the agent's TD targets.
+        lam (float): trace decay λ for TD(λ) backups.
+        n_step (int): use n-step return backups when > 1.
+        trace (str, optional): "accumulating" or "replacing" for TD(λ) backups (see `Robot`).
 
     Returns:
         rewards (list[float]): total rewards per epoch.
         action_count (dict[str, int]): count of each action taken.
         optimal_policy (np.ndarray): learned Q-value table.
     """
-    robot = Robot()
-    env = Environment(alpha, beta, r_s, r_w, robot)
+    seed_seq = seed if isinstance(seed, np.random.SeedSequence) else np.random.SeedSequence(seed)
+    env_rng, robot_rng = (np.random.default_rng(s) for s in seed_seq.spawn(2))
+    robot = Robot(ε=epsilon, lr=lr, capacity=steps + 1, online=online, rng=robot_rng, mdp=mdp,
+                  γ=gamma, λ=lam, n_step=n_step, trace=trace)
+    if mdp is None:
+        env = Environment(alpha, beta, r_s, r_w, robot, rng=env_rng)
+    else:
+        env = MDPEnvironment(mdp, robot, rng=env_rng)
+    # tabelas fora do formato (2, 3) do log de métricas e do policy store
+    standard_shape = robot.estimations.shape == (2, 3)
+    if metrics is not None and not standard_shape:
+        raise ValueError(f"metrics log only supports (2, 3) Q-tables, got {robot.estimations.shape}")
+    invalid = ~robot.valid
     rewards: list[float] = []
-    action_list: list[str] = ["search", "wait", "recharge"]
+    action_list: list[str] = robot.actions_list
     action_count: dict[str, int] = {action: 0 for action in action_list}
 
     for i in range(1, epochs + 1):
         for j in range(steps):
             # Escolhe ação com base na política epsilon-greedy e executa no ambiente
             action = robot.act()
-            env.step(state=robot.state_hist[-1], action=action)
+            env.step(state=robot.state, action=action)
             action_count[action] += 1
 
             # backup a cada 200 passos
@@ -39,16 +75,26 @@ def train(epochs: int, steps: int, alpha: float, beta: float, r_s: float, r_w: f
         # backup ao final de uma epoch
         robot.backup()
 
-        if i % 50 == 0:
-            print(f'Epoch: {i} | Reward: {np.sum(robot.reward_hist)}\r', end='')
+        if verbose and i % 50 == 0:
+            print(f'Epoch: {i} | Reward: {robot.total_reward}\r', end='')
 
-        rewards.append(np.sum(robot.reward_hist))
+        rewards.append(robot.total_reward)
+        if metrics is not None:
+            metrics.write(i, rewards[-1], np.bincount(robot.action_hist, minlength=3), robot.estimations)
         robot.reset()
 
+        if early_stopping is not None and early_stopping.update(rewards[-1], robot.estimations, invalid):
+            if verbose:
+                print(f'\nStopped early at epoch {i}', end='')
+            break
+
     # Obtém a política ótima aprendida e a salva
     optimal_policy = robot.estimations
-    robot.save_policy()
-    print("")
+    if save_policy and standard_shape:
+        robot.save_policy(alpha=alpha, beta=beta, r_search=r_s, r_wait=r_w, epoch=len(rewards),
+                          seed=seed if isinstance(seed, int) else -1)
+    if verbose:
+        print("")
 
     # Escreve rewards.txt após o treinamento principal se save for True
     if save:
@@ -57,28 +103,159 @@ def train(epochs: int, steps: int, alpha: float, beta: float, r_s: float, r_w: f
     return rewards, action_count, optimal_policy
 
 
-def train_multiple_runs(params: dict, num_runs: int = 5) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+def train_batched(epochs: int, steps: int, alpha: float, beta: float, r_s: float, r_w: float, num_runs: int,
+                  epsilon: float = 0.001, lr: float = 0.1, backup_every: int = 200,
+                  rng: np.random.Generator | None = None, verbose: bool = True,
+                  gamma: float = 1.0) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Trains num_runs independent agents in lockstep, with every array op batched over the runs
+
+    Mirrors `train`: ε-greedy with random tie-breaking and the invalid recharge mask, TD backups
+    after step `backup_every` (and every multiple of it) and at the end of each epoch, each
+    transition applied once, and the battery reset to high between epochs.
+
+    Since the Q-tables only change on backups, the policy is fixed inside each backup window.
+    Every step of a window is then a map {low, high} -> {low, high} known in advance from the
+    random draws, so the battery trajectory of the whole window comes out of a prefix composition
+    of those maps (log2(window) NumPy calls) instead of one env call per step.
+
+    Args:
+        epochs (int): number of epochs.
+        steps (int): steps per epoch.
+        alpha (float): probability of battery staying high after searching.
+        beta (float): probability of battery staying low after searching.
+        r_s (float): reward for searching.
+        r_w (float): reward for waiting.
+        num_runs (int): number of independent agents (R).
+        epsilon (float): epsilon for the epsilon-greedy policy.
+        lr (float): learning rate for TD updates.
+        backup_every (int): steps between TD backups (1 for online updates).
+        rng (np.random.Generator, optional): random generator for all draws.
+        verbose (bool): print training progress.
+        gamma (float): discount factor of the TD targets (one-step backups only).
+
+    Returns:
+        rewards (np.ndarray): total rewards per epoch, shape (R, epochs).
+        action_counts (np.ndarray): count of each action taken, shape (R, 3).
+        estimations (np.ndarray): learned Q-value tables, shape (R, 2, 3).
+    """
+    rng = rng if rng is not None else np.random.default_rng()
+    env = VectorEnvironment(alpha, beta, r_s, r_w, num_runs, rng=rng)
+    runs = np.arange(num_runs)
+
+    # mesma inicialização do Robot, guardada como (célula, run) com célula = estado_idx * 3 + ação
+    q_cells = np.ones(shape=(6, num_runs))
+    q_cells[5] = 0
+    q_flat = q_cells.reshape(-1) # view, indexada por célula * R + run
+    invalid = np.array([[False, False, False], [False, False, True]]) # recarregar com bateria cheia
+    n_valid = np.array([3, 2])
+    batteries = np.array([1, 2], dtype=np.int8) # os dois estados possíveis, no último eixo
+
+    # janelas entre backups, como em train: após o passo j (j % backup_every == 0, j > 0) e no fim
+    ends = [j + 1 for j in range(1, steps) if j % backup_every == 0] if backup_every > 1 else list(range(1, steps))
+    windows = [(start, end) for start, end in zip([0] + ends, ends + [steps]) if end > start]
+
+    all_rewards = np.zeros((num_runs, epochs))
+    action_counts = np.zeros((num_runs, 3), dtype=np.int64)
+
+    for i in range(1, epochs + 1):
+        high = np.ones(num_runs, dtype=bool) # todas começam com bateria alta
+        epoch_reward = np.zeros(num_runs)
+
+        for start, end in windows:
+            length = end - start
+            explore_u, pick_u, env_u = rng.random((3, length, num_runs, 1))
+
+            # ação de cada run em cada passo para cada estado possível, shape (length, R, 2)
+            values = np.where(invalid, -np.inf, q_cells.T.reshape(num_runs, 2, 3))
+            best = values == values.max(axis=2, keepdims=True)
+            order = np.argsort(~best, axis=2, kind="stable") # ações empatadas no máximo primeiro
+            rank = (pick_u * best.sum(axis=2)).astype(np.intp)
+            greedy = order[runs[:, None], [0, 1], rank]
+            explore = (pick_u * n_valid).astype(np.intp)
+            acts = np.where(explore_u < epsilon, explore, greedy)
+            next_batteries, rews = env.transition(batteries, acts, env_u)
+
+            # composição prefixada dos mapas de transição: maps[j] = f_j o ... o f_start
+            # (cada mapa leva bateria baixa/alta, último eixo, em "ficou alta?")
+            maps = next_batteries == 2
+            shift = 1
+            while shift < length:
+                maps[shift:] = np.where(maps[:-shift], maps[shift:, :, 1:], maps[shift:, :, :1])
+                shift *= 2
+            visited = np.empty((length + 1, num_runs), dtype=bool)
+            visited[0] = high
+            visited[1:] = np.where(high, maps[..., 1], maps[..., 0])
+
+            # ações e recompensas efetivamente realizadas
+            taken = np.where(visited[:-1], acts[..., 1], acts[..., 0])
+            rewards = np.where(visited[:-1], rews[..., 1], rews[..., 0])
+            cells = (visited[:-1] * 3 + taken) * num_runs + runs
+            next_high = visited[1:]
+
+            # backup td da janela, transição por transição, vetorizado sobre as runs
+            for k in range(length):
+                max_low = np.maximum(np.maximum(q_cells[0], q_cells[1]), q_cells[2])
+                max_high = np.maximum(q_cells[3], q_cells[4])
+                curr_q = q_flat[cells[k]]
+                q_flat[cells[k]] = curr_q + lr * (rewards[k] + gamma * np.where(next_high[k], max_high, max_low) - curr_q)
+
+            high = visited[-1]
+            epoch_reward += rewards.sum(axis=0)
+            action_counts += (taken[..., None] == np.arange(3)).sum(axis=0)
+
+        all_rewards[:, i - 1] = epoch_reward
+
+        if verbose and i % 50 == 0:
+            print(f'Epoch: {i} | Mean reward: {epoch_reward.mean()}\r', end='')
+    if verbose:
+        print("")
+
+    estimations = q_cells.T.reshape(num_runs, 2, 3).copy()
+    return all_rewards, action_counts, estimations
+
+
+def train_multiple_runs(params: dict, num_runs: int = 5, seed: int | None = None) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
     """Runs multiple independent training sessions for the recycling robot RL agent
 
+    All runs are trained together by `train_batched`, which only covers the 2-level robot
+    with one-step backups; with an `mdp` or a multi-step mode (lam > 0, n_step > 1 or a
+    trace) each run is trained by `train` on its own seed instead. Nothing is written to disk.
+
     Args:
         num_runs (int): Number of independent training runs.
-        params (dict): Dictionary of parameters to pass to the train function.
+        params (dict): keyword arguments of `train` (save, save_policy, early_stopping,
+            metrics and seed are ignored).
+        seed (int, optional): seed of the runs (reproduces all runs).
 
     Returns:
         avg_rewards (np.ndarray): avg rewards per epoch across runs.
         std_rewards (np.ndarray): std of rewards per epoch.
         all_rewards_array (np.ndarray): All rewards from all runs.
     """
-    all_rewards: list[list[float]] = []
-    
-    # Treina multiplas vezes e salva as recompensas de cada treinamento
-    for i in range(num_runs):
-        print(f"Starting training run {i+1}/{num_runs}")
-        rewards, _, _ = train(**params)
-        all_rewards.append(rewards)
-    
+    params = dict(params)
+    for key in ("save", "save_policy", "early_stopping", "metrics", "seed"):
+        params.pop(key, None)
+    verbose = params.pop("verbose", True)
+
+    multi_step = params.get("lam", 0.0) > 0 or params.get("n_step", 1) > 1 or params.get("trace") is not None
+    if params.get("mdp") is not None or multi_step:
+        # um treino por run, cada um com sua seed derivada de `seed`
+        if verbose:
+            print(f"Starting {num_runs} training runs")
+        seeds = np.random.SeedSequence(seed).spawn(num_runs)
+        all_rewards_array = np.array([train(**params, save_policy=False, verbose=False, seed=s)[0] for s in seeds])
+    else:
+        for key in ("mdp", "lam", "n_step", "trace"):
+            params.pop(key, None)
+        if params.pop("online", False):
+            params["backup_every"] = 1
+        # Treina todas as runs em paralelo e salva as recompensas de cada treinamento
+        if verbose:
+            print(f"Starting {num_runs} batched training runs")
+        all_rewards_array, _, _ = train_batched(**params, num_runs=num_runs, rng=np.random.default_rng(seed),
+                                                verbose=verbose)
+
     # Calcula média e desvio padrão das recompensas
-    all_rewards_array = np.array(all_rewards)
     avg_rewards = np.mean(all_rewards_array, axis=0)
     std_rewards = np.std(all_rewards_array, axis=0)
     
@@ -98,6 +275,9 @@ def write_rewards(rewards: list[float], filename: str = "rewards.txt") -> None:
 
 
 if __name__ == '__main__':
+    # camada de visualização importada só quando há figuras para gerar
+    from viz import save_fig_rewards, save_fig_action_distribution, save_fig_optimal_policy_heatmap, save_fig_multiple_rewards
+
     # probabilidades
     α = 0.3
     β = 0.2
@@ -120,8 +300,9 @@ if __name__ == '__main__':
         "r_w": r_wait
     }
 
-    # treinamento principal e salva rewards.txt
-    rewards, action_count, optimal_policy = train(**params, save=True)
+    # treinamento principal, com métricas gravadas durante o treino, e salva rewards.txt
+    with MetricsWriter("metrics.npy", mode="w") as metrics:
+        rewards, action_count, optimal_policy = train(**params, save=True, metrics=metrics)
 
     # plota resultados do treinamento principal
     save_fig_rewards(rewards)
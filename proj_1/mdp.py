@@ -0,0 +1,177 @@
+from bisect import bisect_right
+
+import numpy as np
+
+
+class TabularMDP:
+    def __init__(self, indptr: np.ndarray, indices: np.ndarray, probs: np.ndarray, rewards: np.ndarray,
+                 valid: np.ndarray, actions: list[str], initial_state: int) -> None:
+        """Tabular mdp with transitions stored in CSR form
+
+        Row `s * n_actions + a` holds the possible outcomes of taking action a in state s:
+        `indices[indptr[row]:indptr[row + 1]]` are the next states, with matching `probs` and
+        `rewards`. Invalid (state, action) pairs have empty rows. Memory grows with the number
+        of outcomes, not with n_states ** 2.
+
+        Args:
+            indptr (np.ndarray): row pointers, shape (n_states * n_actions + 1,).
+            indices (np.ndarray): next state of each outcome.
+            probs (np.ndarray): probability of each outcome (each valid row sums to 1).
+            rewards (np.ndarray): reward of each outcome.
+            valid (np.ndarray): valid-action mask, shape (n_states, n_actions).
+            actions (list[str]): action names.
+            initial_state (int): state index episodes start from.
+        """
+        self.indptr = np.asarray(indptr, dtype=np.int64)
+        self.indices = np.asarray(indices, dtype=np.int64)
+        self.probs = np.asarray(probs, dtype=np.float64)
+        self.rewards = np.asarray(rewards, dtype=np.float64)
+        self.valid = np.asarray(valid, dtype=bool)
+        self.actions = list(actions)
+        self.initial_state = initial_state
+        self.n_states, self.n_actions = self.valid.shape
+
+        # linha de cada resultado e chave acumulada global (linha + prob. acumulada na linha),
+        # que permite amostrar várias linhas com um único searchsorted
+        self._rows = np.repeat(np.arange(self.n_states * self.n_actions), np.diff(self.indptr))
+        cumulative = np.cumsum(self.probs)
+        row_start = np.concatenate([[0.0], cumulative])[self.indptr[:-1]]
+        self._keys = self._rows + (cumulative - row_start[self._rows])
+        # cópias em listas python para amostrar uma transição por vez sem overhead do numpy
+        self._keys_list = self._keys.tolist()
+        self._indptr_list = self.indptr.tolist()
+        self._indices_list = self.indices.tolist()
+        self._rewards_list = self.rewards.tolist()
+
+    @classmethod
+    def from_dense(cls, P: np.ndarray, R: np.ndarray, valid: np.ndarray, actions: list[str],
+                   initial_state: int) -> 'TabularMDP':
+        """Build from dense tables, keeping only outcomes with non-zero probability
+
+        Args:
+            P (np.ndarray): transition probabilities P[s, a, s'].
+            R (np.ndarray): rewards R[s, a, s'].
+            valid (np.ndarray): valid-action mask, shape (n_states, n_actions).
+            actions (list[str]): action names.
+            initial_state (int): state index episodes start from.
+
+        Returns:
+            TabularMDP: the sparse mdp.
+        """
+        P = np.where(np.asarray(valid)[..., None], P, 0.0)
+        flat = P.reshape(-1, P.shape[-1])
+        rows, next_states = np.nonzero(flat)
+        indptr = np.concatenate([[0], np.cumsum(np.bincount(rows, minlength=len(flat)))])
+        rewards = np.asarray(R).reshape(flat.shape)[rows, next_states]
+        return cls(indptr, next_states, flat[rows, next_states], rewards, valid, actions, initial_state)
+
+    @classmethod
+    def battery(cls, levels: int, α: float, β: float, r_search: float, r_wait: float) -> 'TabularMDP':
+        """Recycling robot with `levels` battery levels (index 0 empty-ish, levels - 1 full)
+
+        Searching above the lowest level drains one level with prob 1 - α; at the lowest level
+        it keeps the battery with prob β, otherwise the robot is rescued to full with -3.
+        Waiting keeps the level, recharging goes to full and is invalid when already full.
+        With levels=2 this is exactly the mdp of `Environment`.
+
+        Args:
+            levels (int): number of battery levels K (>= 2).
+            α (float): prob of keeping the level after search.
+            β (float): prob of staying at the lowest level after search.
+            r_search (float): reward for searching.
+            r_wait (float): reward for waiting.
+
+        Returns:
+            TabularMDP: the sparse mdp, starting from full battery.
+        """
+        if levels < 2:
+            raise ValueError(f"levels must be >= 2, got {levels}")
+        full = levels - 1
+        indptr, indices, probs, rewards = [0], [], [], []
+        for s in range(levels):
+            # search
+            if s > 0:
+                outcomes = [(s, α, r_search), (s - 1, 1 - α, r_search)]
+            else:
+                outcomes = [(s, β, r_search), (full, 1 - β, -3.0)]
+            # wait, recharge
+            rows = [outcomes, [(s, 1.0, r_wait)], [(full, 1.0, 0.0)] if s < full else []]
+            for row in rows:
+                row = [outcome for outcome in row if outcome[1] > 0]
+                indices += [o[0] for o in row]
+                probs += [o[1] for o in row]
+                rewards += [o[2] for o in row]
+                indptr.append(len(indices))
+        valid = np.ones((levels, 3), dtype=bool)
+        valid[full, 2] = False
+        return cls(indptr, indices, probs, rewards, valid, ["search", "wait", "recharge"], full)
+
+    def sample(self, states, actions, u) -> tuple[np.ndarray, np.ndarray]:
+        """Sample transitions, vectorized over any number of (state, action) pairs
+
+        Args:
+            states (int or np.ndarray): state indices.
+            actions (int or np.ndarray): valid action indices.
+            u (float or np.ndarray): uniform draws in [0, 1).
+
+        Returns:
+            next_states (np.ndarray): sampled next state indices.
+            rewards (np.ndarray): rewards of the sampled outcomes.
+        """
+        rows = np.asarray(states) * self.n_actions + np.asarray(actions)
+        k = np.searchsorted(self._keys, rows + np.asarray(u), side="right")
+        # arredondamento de ponto flutuante pode passar do fim da linha
+        k = np.minimum(k, self.indptr[rows + 1] - 1)
+        return self.indices[k], self.rewards[k]
+
+    def sample_one(self, state: int, action: int, u: float) -> tuple[int, float]:
+        """Sample a single transition with plain python (faster than `sample` for scalars)
+
+        Args:
+            state (int): state index.
+            action (int): valid action index.
+            u (float): uniform draw in [0, 1).
+
+        Returns:
+            next_state (int): sampled next state index.
+            reward (float): reward of the sampled outcome.
+        """
+        row = state * self.n_actions + action
+        k = min(bisect_right(self._keys_list, row + u), self._indptr_list[row + 1] - 1)
+        return self._indices_list[k], self._rewards_list[k]
+
+    def expected_rewards(self) -> np.ndarray:
+        """Expected reward of each (state, action), 0 for invalid pairs
+
+        Returns:
+            np.ndarray: shape (n_states, n_actions).
+        """
+        totals = np.bincount(self._rows, weights=self.probs * self.rewards, minlength=self.n_states * self.n_actions)
+        return totals.reshape(self.n_states, self.n_actions)
+
+    def value_iteration(self, discount: float = 0.9, tol: float = 1e-10,
+                        max_iter: int = 100_000) -> tuple[np.ndarray, np.ndarray]:
+        """Solve for V* and Q* with sparse vectorized value iteration
+
+        Args:
+            discount (float): discount factor γ (< 1).
+            tol (float): stop when the max change in V is below this.
+            max_iter (int): maximum number of sweeps.
+
+        Returns:
+            V (np.ndarray): optimal state values, shape (n_states,).
+            Q (np.ndarray): optimal action values (0 for invalid pairs), shape (n_states, n_actions).
+        """
+        size = self.n_states * self.n_actions
+        expected = self.expected_rewards().reshape(-1)
+        V = np.zeros(self.n_states)
+        for _ in range(max_iter):
+            Q = expected + discount * np.bincount(self._rows, weights=self.probs * V[self.indices], minlength=size)
+            new_V = np.where(self.valid, Q.reshape(self.n_states, self.n_actions), -np.inf).max(axis=1)
+            delta = np.max(np.abs(new_V - V))
+            V = new_V
+            if delta < tol:
+                break
+        Q = expected + discount * np.bincount(self._rows, weights=self.probs * V[self.indices], minlength=size)
+        Q = np.where(self.valid, Q.reshape(self.n_states, self.n_actions), 0.0)
+        return V, Q
@@ -0,0 +1,121 @@
+import os
+
+import numpy as np
+
+
+# um registro por epoch
+METRICS_DTYPE = np.dtype([
+    ("epoch", "<i8"),
+    ("reward", "<f8"),
+    ("action_counts", "<i8", (3,)),
+    ("q", "<f8", (2, 3)),
+])
+
+
+class MetricsWriter:
+    def __init__(self, path: str = "metrics.npy", chunk_size: int = 100, fsync: bool = False,
+                 mode: str = "a") -> None:
+        """Append-only binary log of per-epoch metrics, written in .npy chunks during training
+
+        The file is a sequence of complete .npy arrays of `METRICS_DTYPE` records. Epochs are
+        buffered in a preallocated chunk and appended every `chunk_size` epochs, so a run that
+        dies loses at most one chunk, and a chunk cut short by a crash is skipped by the reader.
+
+        Args:
+            path (str): log file.
+            chunk_size (int): epochs buffered between writes.
+            fsync (bool): fsync after every chunk (survives power loss, costs a disk sync).
+            mode (str): "a" appends to an existing log (e.g. resuming a run), "w" starts a new one.
+        """
+        if mode not in ("a", "w"):
+            raise ValueError(f"mode must be 'a' or 'w', got '{mode}'")
+        self.path = path
+        self.fsync = fsync
+        self._chunk = np.zeros(chunk_size, dtype=METRICS_DTYPE)
+        self._n = 0
+        self._file = open(path, mode + "b")
+
+    def write(self, epoch: int, reward: float, action_counts: np.ndarray, estimations: np.ndarray) -> None:
+        """Record one epoch
+
+        Args:
+            epoch (int): epoch number.
+            reward (float): total reward of the epoch.
+            action_counts (np.ndarray): count of each action in the epoch, shape (3,).
+            estimations (np.ndarray): Q-value table at the end of the epoch, shape (2, 3).
+        """
+        record = self._chunk[self._n]
+        record["epoch"] = epoch
+        record["reward"] = reward
+        record["action_counts"] = action_counts
+        record["q"] = estimations
+        self._n += 1
+        if self._n == len(self._chunk):
+            self.flush()
+
+    def flush(self) -> None:
+        """Append the buffered epochs to the log as one chunk"""
+        if self._n == 0:
+            return
+        np.save(self._file, self._chunk[:self._n])
+        self._file.flush()
+        if self.fsync:
+            os.fsync(self._file.fileno())
+        self._n = 0
+
+    def close(self) -> None:
+        """Flush what is left and close the log"""
+        if not self._file.closed:
+            self.flush()
+            self._file.close()
+
+    def __enter__(self) -> 'MetricsWriter':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def iter_chunks(path: str):
+    """Memory-map each complete chunk of a metrics log
+
+    Args:
+        path (str): log written by `MetricsWriter`.
+
+    Yields:
+        np.memmap: read-only records of one chunk.
+    """
+    size = os.path.getsize(path)
+    readers = {(1, 0): np.lib.format.read_array_header_1_0, (2, 0): np.lib.format.read_array_header_2_0}
+    with open(path, "rb") as f:
+        while f.tell() < size:
+            try:
+                version = np.lib.format.read_magic(f)
+                shape, _, dtype = readers[version](f)
+            except (ValueError, KeyError, EOFError):
+                break # cabeçalho truncado por um crash
+            offset = f.tell()
+            nbytes = int(np.prod(shape)) * dtype.itemsize
+            if offset + nbytes > size:
+                break # chunk truncado por um crash
+            yield np.memmap(path, dtype=dtype, mode="r", offset=offset, shape=shape)
+            f.seek(offset + nbytes)
+
+
+def read_metrics(path: str) -> np.ndarray:
+    """Read a whole metrics log for plotting
+
+    A log with a single chunk is returned as a memory map without copying.
+
+    Args:
+        path (str): log written by `MetricsWriter`.
+
+    Returns:
+        np.ndarray: all records (fields epoch, reward, action_counts, q).
+    """
+    chunks = list(iter_chunks(path))
+    if not chunks:
+        return np.empty(0, dtype=METRICS_DTYPE)
+    if len(chunks) == 1:
+        return chunks[0]
+    return np.concatenate(chunks)
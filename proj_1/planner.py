@@ -0,0 +1,173 @@
+import numpy as np
+
+
+# recarregar com bateria cheia (ação nula), mesmo layout (estado, ação) de Robot.estimations
+INVALID = np.array([[False, False, False], [False, False, True]])
+
+
+def build_model(α: float, β: float, r_search: float, r_wait: float) -> tuple[np.ndarray, np.ndarray]:
+    """Transition and expected reward tensors of the recycling robot mdp
+
+    Same dynamics as `Environment.step`: index 0 is low battery, 1 is high battery, and the
+    actions are (search, wait, recharge).
+
+    Args:
+        α (float): prob of staying high after search.
+        β (float): prob of staying low after search.
+        r_search (float): reward for searching.
+        r_wait (float): reward for waiting.
+
+    Returns:
+        P (np.ndarray): transition probabilities P[s, a, s'], shape (2, 3, 2).
+        R (np.ndarray): expected reward R[s, a], shape (2, 3).
+    """
+    P = np.zeros((2, 3, 2))
+    R = np.zeros((2, 3))
+    # Bateria baixa
+    P[0, 0] = [β, 1 - β]
+    R[0, 0] = β * r_search + (1 - β) * -3
+    P[0, 1, 0] = 1
+    R[0, 1] = r_wait
+    P[0, 2, 1] = 1
+    # Bateria alta (recarregar é inválido, fica em alta sem recompensa)
+    P[1, 0] = [1 - α, α]
+    R[1, 0] = r_search
+    P[1, 1, 1] = 1
+    P[1, 2, 1] = 1
+    R[1, 1] = r_wait
+    return P, R
+
+
+def _state_values(Q: np.ndarray) -> np.ndarray:
+    """Max over valid actions for each state"""
+    return np.where(INVALID, -np.inf, Q).max(axis=1)
+
+
+def value_iteration(α: float, β: float, r_search: float, r_wait: float, discount: float = 0.9,
+                    tol: float = 1e-10, max_iter: int = 100_000) -> tuple[np.ndarray, np.ndarray]:
+    """Solve for V* and Q* by vectorized value iteration
+
+    The task is continuing, so discount must be < 1 for the values to be finite.
+
+    Args:
+        α (float): prob of staying high after search.
+        β (float): prob of staying low after search.
+        r_search (float): reward for searching.
+        r_wait (float): reward for waiting.
+        discount (float): discount factor γ.
+        tol (float): stop when the max change in V is below this.
+        max_iter (int): maximum number of sweeps.
+
+    Returns:
+        V (np.ndarray): optimal state values, shape (2,).
+        Q (np.ndarray): optimal action values in the `Robot.estimations` layout, shape (2, 3).
+    """
+    P, R = build_model(α, β, r_search, r_wait)
+    V = np.zeros(2)
+    for _ in range(max_iter):
+        Q = R + discount * P @ V
+        new_V = _state_values(Q)
+        delta = np.max(np.abs(new_V - V))
+        V = new_V
+        if delta < tol:
+            break
+    Q = R + discount * P @ V
+    Q[INVALID] = 0
+    return V, Q
+
+
+def evaluate_policy(policy: np.ndarray, α: float, β: float, r_search: float, r_wait: float,
+                    discount: float = 0.9) -> tuple[np.ndarray, np.ndarray]:
+    """Exact policy evaluation by a direct linear solve of (I - γ P_π) V = R_π
+
+    Args:
+        policy (np.ndarray): action index per state, shape (2,), or action probabilities, shape (2, 3).
+        α (float): prob of staying high after search.
+        β (float): prob of staying low after search.
+        r_search (float): reward for searching.
+        r_wait (float): reward for waiting.
+        discount (float): discount factor γ.
+
+    Returns:
+        V (np.ndarray): state values under the policy, shape (2,).
+        Q (np.ndarray): action values under the policy, shape (2, 3).
+    """
+    P, R = build_model(α, β, r_search, r_wait)
+    policy = np.asarray(policy)
+    if policy.ndim == 1:
+        policy = np.eye(3)[policy]
+    P_π = np.einsum("sa,sat->st", policy, P)
+    R_π = np.einsum("sa,sa->s", policy, R)
+    V = np.linalg.solve(np.eye(2) - discount * P_π, R_π)
+    Q = R + discount * P @ V
+    Q[INVALID] = 0
+    return V, Q
+
+
+def policy_iteration(α: float, β: float, r_search: float, r_wait: float,
+                     discount: float = 0.9) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Solve the mdp exactly with policy iteration (linear solve per evaluation)
+
+    Args:
+        α (float): prob of staying high after search.
+        β (float): prob of staying low after search.
+        r_search (float): reward for searching.
+        r_wait (float): reward for waiting.
+        discount (float): discount factor γ.
+
+    Returns:
+        policy (np.ndarray): optimal action index per state, shape (2,).
+        V (np.ndarray): optimal state values, shape (2,).
+        Q (np.ndarray): optimal action values, shape (2, 3).
+    """
+    policy = np.zeros(2, dtype=int)
+    while True:
+        V, Q = evaluate_policy(policy, α, β, r_search, r_wait, discount)
+        new_policy = greedy_policy(Q)
+        if np.array_equal(new_policy, policy):
+            return policy, V, Q
+        policy = new_policy
+
+
+def greedy_policy(Q: np.ndarray, invalid: np.ndarray | None = None) -> np.ndarray:
+    """Greedy action index per state, ignoring invalid actions
+
+    Args:
+        Q (np.ndarray): Q-value table, shape (2, 3) or (n_states, n_actions).
+        invalid (np.ndarray, optional): invalid-action mask shaped like Q (defaults to the recharge at high battery).
+
+    Returns:
+        np.ndarray: action index per state (low, high).
+    """
+    return np.where(INVALID if invalid is None else invalid, -np.inf, Q).argmax(axis=1)
+
+
+def policy_agreement(Q: np.ndarray, Q_star: np.ndarray) -> bool:
+    """Whether a learned Q-table induces the same greedy policy as the exact solution
+
+    `train` uses an undiscounted update, so its Q-values grow with training and can't be
+    compared to Q* directly; the greedy policies can.
+
+    Args:
+        Q (np.ndarray): learned Q-value table, shape (2, 3).
+        Q_star (np.ndarray): exact Q-value table, shape (2, 3).
+
+    Returns:
+        bool: True if both greedy policies match.
+    """
+    return bool(np.array_equal(greedy_policy(Q), greedy_policy(Q_star)))
+
+
+def warm_start(robot, α: float, β: float, r_search: float, r_wait: float, discount: float = 0.9) -> None:
+    """Initialize a robot's estimations with the exact Q* of the mdp
+
+    Args:
+        robot (Robot): agent to initialize.
+        α (float): prob of staying high after search.
+        β (float): prob of staying low after search.
+        r_search (float): reward for searching.
+        r_wait (float): reward for waiting.
+        discount (float): discount factor γ.
+    """
+    _, _, Q = policy_iteration(α, β, r_search, r_wait, discount)
+    robot.estimations = Q.copy()
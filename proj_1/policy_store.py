@@ -0,0 +1,140 @@
+import os
+
+import numpy as np
+
+
+FORMAT_VERSION = 1
+
+# um registro por política; o arquivo é um .npy estruturado, ordenado por chave
+POLICY_DTYPE = np.dtype([
+    ("version", "<u2"),
+    ("key", "S64"),
+    ("q", "<f8", (2, 3)),
+    ("alpha", "<f8"),
+    ("beta", "<f8"),
+    ("r_search", "<f8"),
+    ("r_wait", "<f8"),
+    ("epsilon", "<f8"),
+    ("lr", "<f8"),
+    ("seed", "<i8"),
+    ("epoch", "<i8"),
+])
+META_FIELDS = ("alpha", "beta", "r_search", "r_wait", "epsilon", "lr", "seed", "epoch")
+
+
+class PolicyStore:
+    def __init__(self, path: str = "policy.npy") -> None:
+        """Many Q-tables plus metadata in a single memory-mapped .npy file
+
+        Records are sorted by key, so lookups are a binary search over the mapped key
+        column and `get` returns a read-only view into the file: opening a store with
+        thousands of policies reads nothing but the header.
+
+        Args:
+            path (str): .npy file of the store (created on the first flush).
+        """
+        self.path = path
+        self._pending: dict[bytes, np.ndarray] = {}
+        self._records = self._open()
+
+    def _open(self) -> np.ndarray:
+        """Memory-map the file, checking its schema and format version"""
+        if not os.path.exists(self.path):
+            return np.empty(0, dtype=POLICY_DTYPE)
+        records = np.load(self.path, mmap_mode="r")
+        if records.dtype != POLICY_DTYPE:
+            raise ValueError(f"{self.path} is not a policy store (dtype {records.dtype})")
+        if len(records) and records["version"][0] != FORMAT_VERSION:
+            raise ValueError(f"{self.path} has format version {records['version'][0]}, expected {FORMAT_VERSION}")
+        return records
+
+    @staticmethod
+    def _encode(key: str) -> bytes:
+        """Key as stored in the file (utf-8, at most 64 bytes)"""
+        encoded = key.encode()
+        if len(encoded) > POLICY_DTYPE["key"].itemsize:
+            raise ValueError(f"policy key longer than {POLICY_DTYPE['key'].itemsize} bytes: '{key}'")
+        return encoded
+
+    def _row(self, key: str) -> int:
+        """Row of a key in the mapped file, or -1"""
+        encoded = self._encode(key)
+        keys = self._records["key"]
+        row = int(np.searchsorted(keys, encoded))
+        return row if row < len(keys) and keys[row] == encoded else -1
+
+    def add(self, key: str, q: np.ndarray, **meta) -> None:
+        """Add (or replace) a policy; it is written on the next `flush`
+
+        Args:
+            key (str): policy name (at most 64 bytes).
+            q (np.ndarray): Q-value table, shape (2, 3).
+            **meta: any of alpha, beta, r_search, r_wait, epsilon, lr, seed, epoch
+                (float fields not given are stored as NaN, seed and epoch as -1).
+        """
+        unknown = set(meta) - set(META_FIELDS)
+        if unknown:
+            raise ValueError(f"unknown policy metadata: {sorted(unknown)}")
+        record = np.zeros((), dtype=POLICY_DTYPE)
+        record["version"] = FORMAT_VERSION
+        record["key"] = self._encode(key)
+        record["q"] = q
+        # NaN marca metadado ausente, distinto de um α/β/ε igual a 0
+        for name in META_FIELDS:
+            record[name] = np.nan if POLICY_DTYPE[name].kind == "f" else -1
+        for name, value in meta.items():
+            record[name] = value
+        self._pending[record["key"].item()] = record
+
+    def flush(self) -> None:
+        """Write pending policies (tmp file + rename) and remap the store"""
+        if not self._pending:
+            return
+        pending = np.array(list(self._pending.values()), dtype=POLICY_DTYPE)
+        keep = ~np.isin(self._records["key"], pending["key"])
+        records = np.concatenate([self._records[keep], pending])
+        records.sort(order="key")
+        tmp = self.path + ".tmp.npy"
+        np.save(tmp, records)
+        os.replace(tmp, self.path)
+        self._pending.clear()
+        self._records = self._open()
+
+    def get(self, key: str) -> np.ndarray:
+        """Q-table of a stored policy (read-only view into the mapped file)
+
+        Args:
+            key (str): policy name.
+
+        Returns:
+            np.ndarray: Q-value table, shape (2, 3).
+        """
+        row = self._row(key)
+        if row < 0:
+            raise KeyError(key)
+        return self._records["q"][row]
+
+    def meta(self, key: str) -> dict:
+        """Metadata of a stored policy
+
+        Args:
+            key (str): policy name.
+
+        Returns:
+            dict: alpha, beta, r_search, r_wait, epsilon, lr, seed and epoch (NaN / -1 if not recorded).
+        """
+        row = self._row(key)
+        if row < 0:
+            raise KeyError(key)
+        record = self._records[row]
+        return {name: record[name].item() for name in META_FIELDS}
+
+    def keys(self) -> list[str]:
+        """Names of all stored policies"""
+        return [key.decode() for key in self._records["key"]]
+
+    def __contains__(self, key: str) -> bool:
+        return self._row(key) >= 0
+
+    def __len__(self) -> int:
+        return len(self._records)
@@ -0,0 +1,150 @@
+from collections import deque
+
+import numpy as np
+
+from planner import greedy_policy
+
+
+class LearningCurve:
+    def __init__(self, window: int = 50) -> None:
+        """Per-epoch learning curve: reward, its moving average, Q-table change and greedy policy
+
+        Args:
+            window (int): size of the reward moving average.
+        """
+        self.window = window
+        self.rewards: list[float] = []
+        self.moving_avg: list[float] = []
+        self.q_change: list[float] = [] # maior variação absoluta da tabela Q na epoch
+        self.policies: list[tuple[int, int]] = []
+        self._recent: deque[float] = deque(maxlen=window)
+        self._recent_sum = 0.0
+        self.last_q: np.ndarray | None = None
+
+    def record(self, reward: float, estimations: np.ndarray, invalid: np.ndarray | None = None) -> None:
+        """Record the end of an epoch
+
+        Args:
+            reward (float): total reward of the epoch.
+            estimations (np.ndarray): Q-value table after the epoch.
+            invalid (np.ndarray, optional): invalid-action mask (see `greedy_policy`).
+        """
+        # média móvel em O(1)
+        if len(self._recent) == self.window:
+            self._recent_sum -= self._recent[0]
+        self._recent.append(reward)
+        self._recent_sum += reward
+
+        self.rewards.append(reward)
+        self.moving_avg.append(self._recent_sum / len(self._recent))
+        self.q_change.append(np.inf if self.last_q is None else float(np.max(np.abs(estimations - self.last_q))))
+        self.policies.append(tuple(greedy_policy(estimations, invalid).tolist()))
+        self.last_q = estimations.copy()
+
+    @property
+    def epoch(self) -> int:
+        """Number of epochs recorded"""
+        return len(self.rewards)
+
+
+class QTableConverged:
+    def __init__(self, tol: float = 1e-3, window: int = 10, relative: bool = False) -> None:
+        """Stop when the Q-table changed by less than tol in every one of the last `window` epochs
+
+        `train` is undiscounted, so its Q-values keep growing with the reward rate; use
+        relative=True there to compare the change against the largest Q-value.
+
+        Args:
+            tol (float): max-abs change threshold.
+            window (int): number of consecutive epochs that must stay below tol.
+            relative (bool): divide the change by max |Q| before comparing.
+        """
+        self.tol = tol
+        self.window = window
+        self.relative = relative
+
+    def __call__(self, curve: LearningCurve) -> bool:
+        """Whether the criterion fires on the curve so far"""
+        if curve.epoch < self.window:
+            return False
+        changes = np.array(curve.q_change[-self.window:])
+        if self.relative:
+            changes = changes / max(np.max(np.abs(curve.last_q)), 1e-12)
+        return bool(np.all(changes < self.tol))
+
+
+class RewardPlateau:
+    def __init__(self, patience: int = 50, min_delta: float = 0.0) -> None:
+        """Stop when the reward moving average hasn't improved for `patience` epochs
+
+        Args:
+            patience (int): epochs without improvement before stopping.
+            min_delta (float): minimum increase that counts as improvement.
+        """
+        self.patience = patience
+        self.min_delta = min_delta
+
+    def __call__(self, curve: LearningCurve) -> bool:
+        """Whether the criterion fires on the curve so far"""
+        if curve.epoch <= max(self.patience, curve.window):
+            return False
+        best_before = max(curve.moving_avg[:-self.patience])
+        return max(curve.moving_avg[-self.patience:]) < best_before + self.min_delta
+
+
+class PolicyStable:
+    def __init__(self, k: int = 50) -> None:
+        """Stop when the greedy policy has been the same for the last k epochs
+
+        Args:
+            k (int): number of epochs the greedy policy must stay unchanged.
+        """
+        self.k = k
+
+    def __call__(self, curve: LearningCurve) -> bool:
+        """Whether the criterion fires on the curve so far"""
+        if curve.epoch < self.k:
+            return False
+        return len(set(curve.policies[-self.k:])) == 1
+
+
+class EarlyStopping:
+    def __init__(self, *criteria, mode: str = "any", min_epochs: int = 0, window: int = 50) -> None:
+        """Pluggable early stopping for `train`
+
+        Criteria are callables taking the `LearningCurve` and returning True to stop
+        (`QTableConverged`, `RewardPlateau`, `PolicyStable` or any custom function).
+
+        Args:
+            *criteria: stopping criteria.
+            mode (str): "any" stops when one criterion fires, "all" when all of them do.
+            min_epochs (int): never stop before this many epochs.
+            window (int): size of the reward moving average of the learning curve.
+        """
+        if mode not in ("any", "all"):
+            raise ValueError(f"mode must be 'any' or 'all', got '{mode}'")
+        self.criteria = criteria
+        self.mode = mode
+        self.min_epochs = min_epochs
+        self.curve = LearningCurve(window)
+        self.stopped_epoch: int | None = None
+
+    def update(self, reward: float, estimations: np.ndarray, invalid: np.ndarray | None = None) -> bool:
+        """Record an epoch and decide whether training should stop
+
+        Args:
+            reward (float): total reward of the epoch.
+            estimations (np.ndarray): Q-value table after the epoch.
+            invalid (np.ndarray, optional): invalid-action mask (see `greedy_policy`).
+
+        Returns:
+            bool: True if training should stop (`stopped_epoch` is then set).
+        """
+        self.curve.record(reward, estimations, invalid)
+        if self.curve.epoch < self.min_epochs or not self.criteria:
+            return False
+        fired = [criterion(self.curve) for criterion in self.criteria]
+        if any(fired) if self.mode == "any" else all(fired):
+            self.stopped_epoch = self.curve.epoch
+            return True
+        return False
@@ -0,0 +1,236 @@
+import argparse
+import itertools
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+from main import train
+from metrics import iter_chunks
+
+
+# parâmetros varridos e seus valores padrão (os mesmos do __main__ de main.py)
+DEFAULTS: dict[str, float] = {
+    "epochs": 1000,
+    "steps": 1000,
+    "alpha": 0.3,
+    "beta": 0.2,
+    "r_s": 3.5,
+    "r_w": 0.5,
+    "epsilon": 0.001,
+    "lr": 0.1,
+}
+INT_PARAMS = ("epochs", "steps")
+
+
+def grid_configs(spec: dict) -> list[dict]:
+    """Expand a spec into the cartesian product of its values
+
+    Args:
+        spec (dict): param name -> scalar (fixed) or list of values.
+
+    Returns:
+        list[dict]: one complete config per grid point.
+    """
+    axes = {name: spec.get(name, default) for name, default in DEFAULTS.items()}
+    for name, values in axes.items():
+        if isinstance(values, dict):
+            raise ValueError(f"range spec for '{name}' needs random sampling (--samples)")
+    names = list(axes)
+    values = [v if isinstance(v, list) else [v] for v in axes.values()]
+    return [_cast(dict(zip(names, combo))) for combo in itertools.product(*values)]
+
+
+def random_configs(spec: dict, num_samples: int, seed: int = 0) -> list[dict]:
+    """Draw random configs from a spec
+
+    Args:
+        spec (dict): param name -> scalar (fixed), list (uniform choice) or
+            {"low": ..., "high": ..., "log": bool} (uniform or log-uniform range).
+        num_samples (int): number of configs to draw.
+        seed (int): seed for the sampler (same seed, same configs).
+
+    Returns:
+        list[dict]: sampled configs.
+    """
+    rng = np.random.default_rng(seed)
+    configs = []
+    for _ in range(num_samples):
+        config = {}
+        for name, default in DEFAULTS.items():
+            value = spec.get(name, default)
+            if isinstance(value, list):
+                value = value[rng.integers(len(value))]
+            elif isinstance(value, dict):
+                low, high = value["low"], value["high"]
+                if value.get("log", False):
+                    value = float(np.exp(rng.uniform(np.log(low), np.log(high))))
+                else:
+                    value = float(rng.uniform(low, high))
+            config[name] = value
+        configs.append(_cast(config))
+    return configs
+
+
+def _cast(config: dict) -> dict:
+    """Cast a config to plain python types (ints for epochs/steps)"""
+    return {name: int(value) if name in INT_PARAMS else float(value) for name, value in config.items()}
+
+
+def config_key(config: dict) -> str:
+    """Stable string identifying a config, used to resume sweeps"""
+    return json.dumps(config, sort_keys=True)
+
+
+def run_config(config: dict, seed: int) -> dict:
+    """Train one config in a worker and summarize the result
+
+    Args:
+        config (dict): complete config (see DEFAULTS).
+        seed (int): seed for this config's random streams.
+
+    Returns:
+        dict: config, seed and result columns for one row.
+    """
+    start = time.perf_counter()
+    rewards, action_count, policy = train(**config, save_policy=False, verbose=False, seed=seed)
+    rewards = np.asarray(rewards)
+    tail = max(1, len(rewards) // 10)
+    return {
+        **config,
+        "key": config_key(config),
+        "seed": seed,
+        "final_reward": rewards[-tail:].mean(),
+        "mean_reward": rewards.mean(),
+        "action_counts": np.array(list(action_count.values())),
+        "q_table": np.array(policy),
+        "seconds": time.perf_counter() - start,
+    }
+
+
+class ResultsFile:
+    def __init__(self, path: str, fsync: bool = False) -> None:
+        """Columnar sweep results streamed to disk as appended .npy chunks
+
+        Each flush appends only the rows completed since the previous one, as one structured
+        .npy array (the chunk format of metrics.py), so writing stays O(new rows) however many
+        configs the sweep has. Chunks are concatenated into columns on load. A chunk cut short
+        by a crash is dropped when the file is reopened, so the sweep resumes after the last
+        complete one.
+
+        Args:
+            path (str): results file; existing rows are loaded so the sweep can resume.
+            fsync (bool): fsync after every chunk.
+        """
+        self.path = path
+        self.fsync = fsync
+        self.chunks: list[np.ndarray] = []
+        self._pending: list[dict] = []
+        end = 0
+        if os.path.exists(path):
+            for chunk in iter_chunks(path):
+                self.chunks.append(np.array(chunk))
+                end = chunk.offset + chunk.nbytes
+            if end < os.path.getsize(path):
+                os.truncate(path, end) # descarta o chunk incompleto
+        self._file = open(path, "ab")
+
+    def done(self) -> set[str]:
+        """Keys of the configs already in the file (or waiting to be flushed)"""
+        keys = {str(key) for chunk in self.chunks for key in chunk["key"]}
+        return keys | {row["key"] for row in self._pending}
+
+    def append(self, row: dict) -> None:
+        """Add one result row (in memory until the next flush)"""
+        self._pending.append(row)
+
+    def flush(self) -> None:
+        """Append the pending rows to the file as one chunk"""
+        if not self._pending:
+            return
+        fields = []
+        for name, value in self._pending[0].items():
+            if isinstance(value, str):
+                fields.append((name, f"<U{max(len(row[name]) for row in self._pending)}"))
+            else:
+                value = np.asarray(value)
+                fields.append((name, value.dtype, value.shape))
+        chunk = np.empty(len(self._pending), dtype=fields)
+        for i, row in enumerate(self._pending):
+            chunk[i] = tuple(row[name] for name, *_ in fields)
+        np.save(self._file, chunk)
+        self._file.flush()
+        if self.fsync:
+            os.fsync(self._file.fileno())
+        self.chunks.append(chunk)
+        self._pending = []
+
+    def columns(self) -> dict[str, np.ndarray]:
+        """All flushed rows, one array per column"""
+        if not self.chunks:
+            return {}
+        return {name: np.concatenate([chunk[name] for chunk in self.chunks]) for name in self.chunks[0].dtype.names}
+
+    def close(self) -> None:
+        """Flush what is left and close the file"""
+        if not self._file.closed:
+            self.flush()
+            self._file.close()
+
+
+def sweep(configs: list[dict], out: str = "sweep_results.npy", workers: int | None = None,
+          seed: int = 0, flush_every: int = 16) -> ResultsFile:
+    """Run every config over a process pool, streaming results into one columnar file
+
+    Each config gets its own seed spawned from `seed` (by position in `configs`), so a
+    config's result doesn't depend on which worker ran it or in what order. Configs already
+    present in `out` are skipped.
+
+    Args:
+        configs (list[dict]): configs to run.
+        out (str): results file (.npy chunks, see ResultsFile).
+        workers (int, optional): number of worker processes (default: all cores).
+        seed (int): root seed of the sweep.
+        flush_every (int): completed configs between writes to disk.
+
+    Returns:
+        ResultsFile: all results, including previously completed ones.
+    """
+    results = ResultsFile(out)
+    done = results.done()
+    seeds = [int(s.generate_state(1)[0]) for s in np.random.SeedSequence(seed).spawn(len(configs))]
+    pending = [(config, s) for config, s in zip(configs, seeds) if config_key(config) not in done]
+    print(f"{len(configs) - len(pending)} configs already done, running {len(pending)}")
+
+    try:
+        with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+            futures = [pool.submit(run_config, config, s) for config, s in pending]
+            for n, future in enumerate(as_completed(futures), start=1):
+                results.append(future.result())
+                if n % flush_every == 0:
+                    results.flush()
+                    print(f'Completed: {n}/{len(pending)}\r', end='')
+    finally:
+        results.close() # grava o que já terminou, mesmo se uma config falhar
+    print("")
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Hyperparameter sweep for the recycling robot")
+    parser.add_argument("spec", help="json file mapping params to values, lists or {low, high, log} ranges")
+    parser.add_argument("--out", default="sweep_results.npy")
+    parser.add_argument("--samples", type=int, default=None, help="random search with this many configs (default: grid)")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    with open(args.spec) as f:
+        spec = json.load(f)
+    if args.samples is None:
+        configs = grid_configs(spec)
+    else:
+        configs = random_configs(spec, args.samples, seed=args.seed)
+    sweep(configs, out=args.out, workers=args.workers, seed=args.seed)
@@ -1,8 +1,37 @@
 import numpy as np
-import random
-import pickle
 from typing import Union
 
+from policy_store import PolicyStore
+from mdp import TabularMDP
+
+class UniformStream:
+    __slots__ = ("rng", "block", "_buffer")
+
+    def __init__(self, rng: Union[np.random.Generator, None] = None, block: int = 4096) -> None:
+        """Uniform [0, 1) draws from a numpy Generator, pre-generated in blocks
+
+        Serving python floats from a block costs far less than one Generator call per draw,
+        and the sequence is fully determined by the generator's seed.
+
+        Args:
+            rng (np.random.Generator, optional): source generator (fresh entropy if None).
+            block (int): number of draws generated at a time.
+        """
+        self.rng = rng if rng is not None else np.random.default_rng()
+        self.block = block
+        self._buffer: list[float] = []
+
+    def next(self) -> float:
+        """Next uniform draw
+
+        Returns:
+            float: value in [0, 1).
+        """
+        if not self._buffer:
+            self._buffer = self.rng.random(self.block).tolist()
+        return self._buffer.pop()
+
+
 class State:
     def __init__(self, battery_level: int = 2) -> None:
         """Initializes the state representing the robot's battery level
@@ -31,7 +60,8 @@ class State:
 
 
 class Environment:
-    def __init__(self, α: float, β: float, r_search: float, r_wait: float, robot: 'Robot') -> None:
+    def __init__(self, α: float, β: float, r_search: float, r_wait: float, robot: 'Robot',
+                 rng: Union[np.random.Generator, None] = None) -> None:
         """Env for recycling robot mdp.
 
         Args:
@@ -40,12 +70,14 @@ class Environment:
             r_search (float): reward for searching.
             r_wait (float): reward for waiting.
             robot (Robot): agent interacting with the environment.
+            rng (np.random.Generator, optional): random generator for the transitions.
         """
         self.α = α
         self.β = β
         self.r_search = r_search
         self.r_wait = r_wait
         self.robot = robot
+        self.uniform = UniformStream(rng)
         self.robot.set_state(2)
 
     def step(self, state: int, action: str) -> None:
@@ -60,7 +92,7 @@ class Environment:
         if state == 1:
             # Procurou com bateria baixa
             if action == "search":
-                if random.random() < self.β:
+                if self.uniform.next() < self.β:
                     reward = self.r_search
                 else:
                     next_state = State(2)
@@ -77,7 +109,7 @@ class Environment:
         if state == 2:
             # Procurou com bateria alta
             if action == "search":
-                if random.random() >= self.α:
+                if self.uniform.next() >= self.α:
                     # Bateria vai para o low
                     next_state = State(1)
                 reward = self.r_search
@@ -89,30 +121,297 @@ class Environment:
         self.robot.set_reward(reward)
 
 
+class MDPEnvironment:
+    def __init__(self, mdp: TabularMDP, robot: 'Robot', rng: Union[np.random.Generator, None] = None) -> None:
+        """Env for any tabular mdp, with the same step API as `Environment`.
+
+        States seen by the robot are 1-based (state index + 1), like the battery levels of `State`.
+
+        Args:
+            mdp (TabularMDP): transition and reward tables.
+            robot (Robot): agent interacting with the environment.
+            rng (np.random.Generator, optional): random generator for the transitions.
+        """
+        self.mdp = mdp
+        self.robot = robot
+        self.uniform = UniformStream(rng)
+        self._action_index = {action: a for a, action in enumerate(mdp.actions)}
+        self.robot.set_state(mdp.initial_state + 1)
+
+    def step(self, state: int, action: str) -> None:
+        """Execute one step in the env given current state and action
+
+        Args:
+            state (int): 1-based state.
+            action (str): Action taken by the agent.
+        """
+        next_state, reward = self.mdp.sample_one(state - 1, self._action_index[action], self.uniform.next())
+        self.robot.set_state(next_state + 1)
+        self.robot.set_reward(reward)
+
+
+class VectorEnvironment:
+    def __init__(self, α: float, β: float, r_search: float, r_wait: float, num_envs: int,
+                 rng: Union[np.random.Generator, None] = None) -> None:
+        """Batched env for the recycling robot mdp, stepping N independent robots at once.
+
+        Battery levels follow the same convention as `State` (1 for low, 2 for high) and
+        actions are indices into `Robot.actions_list` (0 search, 1 wait, 2 recharge).
+
+        Args:
+            α (float): prob of staying high after search.
+            β (float): prob of staying low after search.
+            r_search (float): reward for searching.
+            r_wait (float): reward for waiting.
+            num_envs (int): number of robots stepped per call.
+            rng (np.random.Generator, optional): random generator used for the transitions.
+        """
+        self.α = α
+        self.β = β
+        self.r_search = r_search
+        self.r_wait = r_wait
+        self.num_envs = num_envs
+        self.rng = rng if rng is not None else np.random.default_rng()
+        self.battery = np.full(num_envs, 2, dtype=np.int8)
+        # recompensa fixa por ação (search, wait, recharge), ajustada depois pelo resgate
+        self._action_rewards = np.array([r_search, r_wait, 0.0])
+
+    def reset(self) -> np.ndarray:
+        """Put every robot back on high battery
+
+        Returns:
+            np.ndarray: battery levels (int8) of all robots.
+        """
+        self.battery.fill(2)
+        return self.battery.copy()
+
+    def step(self, actions: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """Execute one step for every robot with a single vectorized draw
+
+        Args:
+            actions (np.ndarray): action index taken by each robot, shape (num_envs,).
+
+        Returns:
+            next_states (np.ndarray): battery levels after the step (int8).
+            rewards (np.ndarray): reward received by each robot (float64).
+        """
+        u = self.rng.random(self.num_envs)
+        self.battery, rewards = self.transition(self.battery, np.asarray(actions), u)
+        return self.battery.copy(), rewards
+
+    def transition(self, battery: np.ndarray, actions: np.ndarray, u: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """Pure transition function, broadcasting over arrays of any shape
+
+        Recharging with a high battery is an invalid action: the robot stays high and gets 0.
+
+        Args:
+            battery (np.ndarray): battery levels (1 or 2).
+            actions (np.ndarray): action indices.
+            u (np.ndarray): uniform draws in [0, 1) deciding the stochastic outcomes.
+
+        Returns:
+            next_states (np.ndarray): battery levels after the transition (int8).
+            rewards (np.ndarray): rewards received (float64).
+        """
+        low = battery == 1
+        search = actions == 0
+        rewards = self._action_rewards[actions]
+
+        # Bateria alta: busca descarrega com prob 1 - α
+        discharged = search & ~low & (u >= self.α)
+        # Bateria baixa: busca esgota com prob 1 - β, robô é resgatado (-3)
+        depleted = search & low & (u >= self.β)
+        recharged = low & (actions == 2)
+
+        rewards = np.where(depleted, -3.0, rewards)
+        next_states = np.where(discharged, 1, np.where(depleted | recharged, 2, battery)).astype(np.int8)
+        return next_states, rewards
+
+
+def discounted_reverse_cumsum(x: np.ndarray, c: float) -> np.ndarray:
+    """Reverse scan D[t] = x[t] + c * D[t + 1] (with D past the end = 0) in NumPy
+
+    Computed blockwise as a cumsum of x[k] * c^k, with blocks short enough that c^k never
+    underflows, so the cost is a few vector ops per block instead of a python loop per entry.
+
+    Args:
+        x (np.ndarray): values to accumulate, shape (L,).
+        c (float): decay per step, in [0, 1].
+
+    Returns:
+        np.ndarray: D, shape (L,).
+    """
+    x = np.asarray(x, dtype=np.float64)
+    if c == 0:
+        return x.copy()
+    n = len(x)
+    # c^block fica acima de 1e-150
+    block = n if c >= 1 else max(1, int(-150 / np.log10(c)))
+    powers = c ** np.arange(min(block, n))
+    out = np.empty(n)
+    carry = 0.0 # D no início do bloco seguinte
+    for end in range(n, 0, -block):
+        start = max(0, end - block)
+        p = powers[:end - start]
+        local = np.cumsum((x[start:end] * p)[::-1])[::-1] / p
+        out[start:end] = local + c ** (end - start) / p * carry
+        carry = out[start]
+    return out
+
+
+class Trajectory:
+    __slots__ = ("states", "actions", "rewards", "n_states", "n_actions", "n_rewards", "reward_sum")
+
+    def __init__(self, capacity: int = 1024) -> None:
+        """Preallocated struct of arrays holding one epoch of agent history
+
+        Each field has its own write cursor; `clear` rewinds them instead of
+        reallocating, and the arrays double in size if an epoch outgrows them.
+
+        Args:
+            capacity (int): initial number of entries per field.
+        """
+        self.states = np.empty(capacity, dtype=np.int32) # baterias (1 para low, 2 para high, até K níveis)
+        self.actions = np.empty(capacity, dtype=np.int32) # ações (index)
+        self.rewards = np.empty(capacity, dtype=np.float64) # recompensas
+        self.n_states = 0
+        self.n_actions = 0
+        self.n_rewards = 0
+        self.reward_sum = 0.0
+
+    def clear(self) -> None:
+        """Rewind all write cursors, keeping the allocated arrays
+        """
+        self.n_states = 0
+        self.n_actions = 0
+        self.n_rewards = 0
+        self.reward_sum = 0.0
+
+    def _grow(self) -> None:
+        """Double the capacity of every field
+        """
+        capacity = 2 * len(self.states)
+        for name in ("states", "actions", "rewards"):
+            old = getattr(self, name)
+            new = np.empty(capacity, dtype=old.dtype)
+            new[:len(old)] = old
+            setattr(self, name, new)
+
+    def push_state(self, state: int) -> None:
+        """Append a battery level to the history
+
+        Args:
+            state (int): battery level (1 or 2).
+        """
+        if self.n_states == len(self.states):
+            self._grow()
+        self.states[self.n_states] = state
+        self.n_states += 1
+
+    def push_action(self, action_idx: int) -> None:
+        """Append an action index to the history
+
+        Args:
+            action_idx (int): index of the action in `Robot.actions_list`.
+        """
+        if self.n_actions == len(self.actions):
+            self._grow()
+        self.actions[self.n_actions] = action_idx
+        self.n_actions += 1
+
+    def push_reward(self, reward: float) -> None:
+        """Append a reward to the history and update the running sum
+
+        Args:
+            reward (float): reward received.
+        """
+        if self.n_rewards == len(self.rewards):
+            self._grow()
+        self.rewards[self.n_rewards] = reward
+        self.n_rewards += 1
+        self.reward_sum += reward
+
+
 class Robot:
-    def __init__(self, ε: float = 0.001, lr: float = 0.1) -> None:
+    def __init__(self, ε: float = 0.001, lr: float = 0.1, capacity: int = 1024, online: bool = False,
+                 rng: Union[np.random.Generator, None] = None, mdp: Union[TabularMDP, None] = None,
+                 γ: float = 1.0, λ: float = 0.0, n_step: int = 1, trace: Union[str, None] = None) -> None:
         """RL agent for recycling robot
 
+        `backup` defaults to one-step Q-learning applied transition by transition. With
+        n_step > 1 it uses n-step returns, and with trace="accumulating" or "replacing" it
+        uses TD(λ) (Peng-style, bootstrapping on the max over valid actions). Both multi-step
+        modes compute their targets for the whole backup window in one reverse scan over the
+        stored trajectory, truncating the returns at the end of the window.
+
         Args:
             ε (float): Epsilon for epsilon-greedy policy.
             lr (float): Learning rate for TD updates.
+            capacity (int): Initial size of the trajectory buffer (steps per epoch + 1 avoids regrowth).
+            online (bool): Apply the TD update as soon as each reward arrives instead of on `backup`.
+            rng (np.random.Generator, optional): random generator for exploration and tie-breaking.
+            mdp (TabularMDP, optional): mdp giving the states, actions and valid-action mask
+                (defaults to the 2-level recycling robot).
+            γ (float): discount factor of the TD targets (1 is the original undiscounted update).
+            λ (float): trace decay for the TD(λ) modes.
+            n_step (int): length of the n-step returns.
+            trace (str, optional): "accumulating" or "replacing" for TD(λ).
         """
+        if trace not in (None, "accumulating", "replacing"):
+            raise ValueError(f"trace must be None, 'accumulating' or 'replacing', got '{trace}'")
+        if trace is not None and n_step > 1:
+            raise ValueError("choose either n-step returns or eligibility traces, not both")
+        if online and (trace is not None or n_step > 1):
+            raise ValueError("multi-step backups need a window of transitions, use online=False")
         self.ε = ε
         self.lr = lr
-        self.estimations = np.ones(shape=(2, 3))
-        self.estimations[1, 2] = 0
-        self.actions_list = ["search", "wait", "recharge"]
-        self.state_hist: list[int] = [] # histórico de baterias (int, 1 para low, 2 para high)
-        self.reward_hist: list[float] = [] # histórico de recompensas (float)
-        self.action_hist: list[int] = [] # histórico de ação (int, index)
+        self.online = online
+        self.γ = γ
+        self.λ = λ
+        self.n_step = n_step
+        self.trace = trace
+        self.uniform = UniformStream(rng)
+        self.watermark = 0 # transições já aplicadas pelo backup na epoch atual
+        if mdp is None:
+            # recarregar com bateria cheia é inválido
+            self.valid = np.array([[True, True, True], [True, True, False]])
+            self.actions_list = ["search", "wait", "recharge"]
+            self.initial_state = 2
+        else:
+            self.valid = mdp.valid
+            self.actions_list = list(mdp.actions)
+            self.initial_state = mdp.initial_state + 1
+        self.valid_actions = [np.flatnonzero(row).tolist() for row in self.valid] # ações válidas por estado
+        self.estimations = np.where(self.valid, 1.0, 0.0)
+        self.trajectory = Trajectory(capacity)
+        self.state = self.initial_state # estado atual (int, 1 para low, 2 para high no caso de 2 níveis)
+
+    @property
+    def state_hist(self) -> np.ndarray:
+        """Battery history of the current epoch (view into the trajectory buffer)"""
+        return self.trajectory.states[:self.trajectory.n_states]
+
+    @property
+    def reward_hist(self) -> np.ndarray:
+        """Reward history of the current epoch (view into the trajectory buffer)"""
+        return self.trajectory.rewards[:self.trajectory.n_rewards]
+
+    @property
+    def action_hist(self) -> np.ndarray:
+        """Action index history of the current epoch (view into the trajectory buffer)"""
+        return self.trajectory.actions[:self.trajectory.n_actions]
+
+    @property
+    def total_reward(self) -> float:
+        """Running sum of the rewards received in the current epoch"""
+        return self.trajectory.reward_sum
 
     def reset(self) -> None:
         """Reset the agent's history for a new episode.
         """
-        self.state_hist = []
-        self.set_state(2)
-        self.reward_hist = []
-        self.action_hist = []
+        self.trajectory.clear()
+        self.watermark = 0
+        self.set_state(self.initial_state)
     
     def set_state(self, state: Union[int, 'State']) -> None:
         """Add current state to agent's battery
@@ -122,9 +421,9 @@ class Robot:
         """
         # garante que está adicionando a bateria, e não o estado
         if isinstance(state, State):
-            self.state_hist.append(state.hash())
-        else:
-            self.state_hist.append(state)
+            state = state.hash()
+        self.state = state
+        self.trajectory.push_state(state)
 
     def set_reward(self, reward: float) -> None:
         """Add received reward to the agent's history
@@ -132,7 +431,9 @@ class Robot:
         Args:
             reward (float): Reward received.
         """
-        self.reward_hist.append(reward)
+        self.trajectory.push_reward(reward)
+        if self.online:
+            self.backup()
 
     def act(self) -> str:
         """Select action via epsilon-greedy policy
@@ -140,64 +441,129 @@ class Robot:
         Returns:
             str: Action chosen ("search", "wait", or "recharge").
         """
-        state = self.state_hist[-1]
-        state_idx = state - 1
-        values = []
+        state_idx = self.state - 1
+        # só ações válidas no estado (ex.: recarregar com bateria cheia é inválido)
+        valid = self.valid_actions[state_idx]
         # caso epsilon
-        if random.random() < self.ε:
-            if state == 2:
-                action = random.choice(self.actions_list[:-1])
-            else:
-                action = random.choice(self.actions_list)
-            self.action_hist.append(self.actions_list.index(action))
-            return action
-        
-        # lida com ação invalida (recarregar com bateria cheia)
-        if state == 2:
-            for action_idx in range(self.estimations.shape[1] - 1):
-                values.append((self.estimations[state_idx][action_idx], action_idx))
+        if self.uniform.next() < self.ε:
+            action_idx = valid[int(self.uniform.next() * len(valid))]
         else:
-            for action_idx in range(self.estimations.shape[1]):
-                values.append((self.estimations[state_idx][action_idx], action_idx))
-
-        # embaralha e ordena as ações
-        np.random.shuffle(values)
-        values.sort(key=lambda x: x[0], reverse=True)
-        action_idx = values[0][1]
-        self.action_hist.append(action_idx)
+            row = self.estimations[state_idx].tolist()
+            best = max(map(row.__getitem__, valid))
+            ties = [a for a in valid if row[a] == best]
+            # desempate aleatório entre as ações de maior valor
+            action_idx = ties[0] if len(ties) == 1 else ties[int(self.uniform.next() * len(ties))]
+        self.trajectory.push_action(action_idx)
         
         return self.actions_list[action_idx]
 
     def backup(self) -> None:
         """Update Q-val estimations using TD algorithm.
+
+        Only transitions past the watermark are applied, so each transition is used exactly
+        once per epoch no matter how often this is called.
+        """
+        traj = self.trajectory
+        start, end = self.watermark, traj.n_rewards
+        if self.trace is not None or self.n_step > 1:
+            if end > start:
+                self._multi_step_backup(start, end)
+            self.watermark = end
+            return
+        states = traj.states[start:end + 1].tolist()
+        actions = traj.actions[start:end].tolist()
+        rewards = traj.rewards[start:end].tolist()
+        for k in range(end - start):
+            self._td_update(states[k], actions[k], rewards[k], states[k+1])
+        self.watermark = end
+
+    def _multi_step_backup(self, start: int, end: int) -> None:
+        """Apply n-step or TD(λ) targets for transitions [start, end) with NumPy ops
+
+        Targets come from the Q-table as it was before the window. Each one is then applied
+        as the usual Q += lr * (target - Q). Repeated visits to a cell are composed in closed
+        form, Q <- (1-lr)^m Q + sum_i lr (1-lr)^(m-i) G_i, which equals applying them one
+        after the other.
+
+        Args:
+            start (int): first transition of the window.
+            end (int): one past the last transition of the window.
+        """
+        traj = self.trajectory
+        q = self.estimations
+        n_actions = q.shape[1]
+        q_flat = q.reshape(-1)
+        states = traj.states[start:end + 1].astype(np.int64) - 1
+        cells = states[:-1] * n_actions + traj.actions[start:end]
+        rewards = traj.rewards[start:end]
+        L = end - start
+        # valor de bootstrap de cada próximo estado: máximo entre as ações válidas
+        next_values = np.where(self.valid, q, -np.inf).max(axis=1)[states[1:]]
+        positions = np.arange(L)
+
+        if self.trace is None:
+            # retorno de n passos, truncado no fim da janela
+            horizon = np.minimum(self.n_step, L - positions)
+            discounted = np.append(discounted_reverse_cumsum(rewards, self.γ), 0.0)
+            targets = (discounted[:L] - self.γ ** horizon * discounted[positions + horizon]
+                       + self.γ ** horizon * next_values[positions + horizon - 1])
+        else:
+            c = self.γ * self.λ
+            td_errors = rewards + self.γ * next_values - q_flat[cells]
+            # G^λ_t - Q(s_t, a_t) = soma de (γλ)^k δ_{t+k}
+            corrections = np.append(discounted_reverse_cumsum(td_errors, c), 0.0)
+            if self.trace == "replacing":
+                # o traço de uma célula é reiniciado na próxima visita a ela
+                order = np.argsort(cells, kind="stable")
+                following = np.full(L, L)
+                same = cells[order[1:]] == cells[order[:-1]]
+                following[order[:-1][same]] = order[1:][same]
+                corrections[:L] -= c ** (following - positions) * corrections[following]
+            targets = q_flat[cells] + corrections[:L]
+
+        # aplica os alvos de cada célula em ordem, em forma fechada
+        size = q_flat.size
+        order = np.argsort(cells, kind="stable")
+        sorted_cells = cells[order]
+        counts = np.bincount(cells, minlength=size)
+        rank = positions - (np.cumsum(counts) - counts)[sorted_cells]
+        weights = self.lr * (1 - self.lr) ** (counts[sorted_cells] - 1 - rank)
+        q_flat[:] = (1 - self.lr) ** counts * q_flat + np.bincount(sorted_cells, weights=weights * targets[order],
+                                                                   minlength=size)
+
+    def _td_update(self, state: int, action_idx: int, reward: float, next_state: int) -> None:
+        """Apply a single Q-learning update for one transition
+
+        Args:
+            state (int): battery before the action (1-based).
+            action_idx (int): index of the action taken.
+            reward (float): reward received.
+            next_state (int): battery after the action (1-based).
+        """
+        q = self.estimations
+        # Q-value máximo entre as ações válidas do próximo estado
+        max_next_q = max(map(q[next_state - 1].tolist().__getitem__, self.valid_actions[next_state - 1]))
+        # update td com max_q
+        td_error = reward + self.γ * max_next_q - q[state - 1, action_idx]
+        q[state - 1, action_idx] += self.lr * td_error
+
+    def save_policy(self, path: str = "policy.npy", key: str = "default", **meta) -> None:
+        """Save learned Q-value table to a policy store
+
+        Args:
+            path (str): policy store file.
+            key (str): name of the policy inside the store.
+            **meta: env params, seed and epoch to store with it (see `PolicyStore.add`).
+        """
+        store = PolicyStore(path)
+        store.add(key, self.estimations, epsilon=self.ε, lr=self.lr, **meta)
+        store.flush()
+
+    def load_policy(self, path: str = "policy.npy", key: str = "default") -> None:
+        """Load Q-value table from a policy store
+
+        Args:
+            path (str): policy store file.
+            key (str): name of the policy inside the store.
         """
-        for k in range(len(self.state_hist) - 1):
-            curr_state_idx = self.state_hist[k] - 1
-            next_state_idx = self.state_hist[k+1] - 1
-            action_idx = self.action_hist[k]
-            reward = self.reward_hist[k]
-            
-            # encontra Q-value máximo em cada caso possível
-            if self.state_hist[k+1] == 2:
-                next_values = [self.estimations[next_state_idx][0], 
-                            self.estimations[next_state_idx][1]]
-            else:
-                next_values = [self.estimations[next_state_idx][a] for a in range(3)]
-            
-            max_next_q = max(next_values)
-            # update td com max_q
-            curr_q = self.estimations[curr_state_idx][action_idx]
-            td_error = reward + max_next_q - curr_q
-            self.estimations[curr_state_idx][action_idx] += self.lr * td_error
-
-    def save_policy(self) -> None:
-        """Save learned Q-value table to a pkl file
-        """
-        with open('policy.pkl', 'wb') as f:
-            pickle.dump(self.estimations, f)
-
-    def load_policy(self) -> None:
-        """Load Q-value table from a pkl file
-        """
-        with open('policy.pkl', 'rb') as f:
-            self.estimations = pickle.load(f)
+        self.estimations = np.array(PolicyStore(path).get(key))
@@ -1,16 +1,93 @@
-import seaborn as sns
-import matplotlib.pyplot as plt
 import numpy as np
 
 
-def save_fig_rewards(rewards: list[float]) -> None:
+def _pyplot():
+    """Import matplotlib and seaborn on first use, forcing the non-interactive Agg backend
+
+    Training code never pays for these imports; only a figure request does.
+
+    Returns:
+        tuple: (matplotlib.pyplot, seaborn) modules.
+    """
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+    return plt, sns
+
+
+def summarize_runs(all_rewards: np.ndarray, quantiles: tuple[float, ...] = (0.05, 0.25, 0.5, 0.75, 0.95)) -> dict[str, np.ndarray]:
+    """Per-epoch summary statistics over runs, computed with vectorized reductions along the runs axis
+
+    Args:
+        all_rewards (np.ndarray): rewards from all runs, shape (runs, epochs).
+        quantiles (tuple[float, ...]): quantile levels to compute.
+
+    Returns:
+        dict[str, np.ndarray]: "mean", "std" and "q<level>" (e.g. "q0.05") curves, each of shape (epochs,).
+    """
+    all_rewards = np.asarray(all_rewards, dtype=float)
+    summary = {"mean": all_rewards.mean(axis=0), "std": all_rewards.std(axis=0)}
+    for level, curve in zip(quantiles, np.quantile(all_rewards, quantiles, axis=0)):
+        summary[f"q{level}"] = curve
+    return summary
+
+
+def minmax_downsample(y: np.ndarray, max_points: int) -> tuple[np.ndarray, np.ndarray]:
+    """Downsample series to at most max_points, keeping the min and max of every bucket
+
+    Spikes survive (unlike striding), and the whole thing is a couple of vectorized
+    reductions, also over a leading runs axis.
+
+    Args:
+        y (np.ndarray): series, shape (T,) or (runs, T).
+        max_points (int): point budget per series (e.g. 2x the plot width in pixels).
+
+    Returns:
+        x (np.ndarray): kept epoch indices, same leading shape as the values.
+        values (np.ndarray): kept values.
+    """
+    y = np.asarray(y, dtype=float)
+    length = y.shape[-1]
+    n_buckets = max(max_points // 2, 1)
+    if length <= max_points:
+        return np.broadcast_to(np.arange(length), y.shape), y
+    width = -(-length // n_buckets)
+    n_buckets = -(-length // width)
+    # completa o último bucket com NaN para poder usar reshape
+    padded = np.pad(y, [(0, 0)] * (y.ndim - 1) + [(0, n_buckets * width - length)], constant_values=np.nan)
+    buckets = padded.reshape(*y.shape[:-1], n_buckets, width)
+    lo, hi = np.nanargmin(buckets, axis=-1), np.nanargmax(buckets, axis=-1)
+    offsets = np.arange(n_buckets) * width
+    # mantém a ordem temporal dentro de cada bucket
+    x = np.stack([np.minimum(lo, hi) + offsets, np.maximum(lo, hi) + offsets], axis=-1)
+    x = x.reshape(*y.shape[:-1], 2 * n_buckets)
+    return x, np.take_along_axis(y, x, axis=-1)
+
+
+def _bucket_reduce(y: np.ndarray, max_points: int, reduce) -> tuple[np.ndarray, np.ndarray]:
+    """Reduce a summary curve to at most max_points buckets (bucket centers, reduced values)"""
+    length = len(y)
+    if length <= max_points:
+        return np.arange(length), y
+    width = -(-length // max_points)
+    n_buckets = -(-length // width)
+    padded = np.pad(np.asarray(y, dtype=float), (0, n_buckets * width - length), constant_values=np.nan)
+    x = np.minimum(np.arange(n_buckets) * width + (width - 1) / 2, length - 1)
+    return x, reduce(padded.reshape(n_buckets, width), axis=1)
+
+
+def save_fig_rewards(rewards: list[float], max_points: int = 2000) -> None:
     """Plot and save the total reward per epoch
     
     Args:
         rewards (list[float]): List of rewards for each epoch.
+        max_points (int): point budget of the curve (min/max downsampled beyond it).
     """
+    plt, sns = _pyplot()
+    x, y = minmax_downsample(rewards, max_points)
     plt.figure(figsize=(10, 5))
-    sns.lineplot(data=rewards)
+    sns.lineplot(x=x, y=y)
     plt.title("Training Rewards Over Time")
     plt.xlabel("Epoch")
     plt.ylabel("Total Reward")
@@ -19,25 +96,58 @@ def save_fig_rewards(rewards: list[float]) -> None:
     plt.close()
 
 
-def save_fig_multiple_rewards(all_rewards: np.ndarray, avg_rewards: np.ndarray, std_rewards: np.ndarray) -> None:
+def save_fig_multiple_rewards(all_rewards: np.ndarray, avg_rewards: np.ndarray | None = None,
+                              std_rewards: np.ndarray | None = None, summary: dict[str, np.ndarray] | None = None,
+                              max_points: int = 2000, max_runs: int = 200) -> None:
     """plot reward curves for multiple training runs
+
+    Runs are min/max downsampled to max_points and drawn as one LineCollection, and the
+    bands come from precomputed summary statistics, so the cost doesn't grow with the data.
+    When only avg_rewards and std_rewards are given, no statistics are computed from
+    all_rewards and the 5%-95% band is left out.
     
     Args:
         all_rewards (np.ndarray): rewards from all runs.
-        avg_rewards (np.ndarray): avg rewards per epoch.
-        std_rewards (np.ndarray): std of rewards per epoch.
+        avg_rewards (np.ndarray, optional): avg rewards per epoch (default: from summary).
+        std_rewards (np.ndarray, optional): std of rewards per epoch (default: from summary).
+        summary (dict, optional): output of `summarize_runs` (computed from all_rewards if
+            missing and avg_rewards/std_rewards aren't both given).
+        max_points (int): point budget per curve.
+        max_runs (int): at most this many individual runs are drawn (evenly spaced subset).
     """
-    plt.figure(figsize=(10, 6))
-    # runs individuais em baixa opacidade
-    colors = plt.cm.viridis(np.linspace(0, 1, len(all_rewards)))
-    for i, rewards in enumerate(all_rewards):
-        plt.plot(rewards, alpha=0.15, color=colors[i])
-    # média com intervalo de confiança
-    plt.plot(avg_rewards, linewidth=2, color='red', label="Average")
-    plt.fill_between(range(len(avg_rewards)), 
-                    avg_rewards - std_rewards, 
-                    avg_rewards + std_rewards, 
-                    alpha=0.2, color='red')
+    plt, sns = _pyplot()
+    from matplotlib.collections import LineCollection
+
+    all_rewards = np.asarray(all_rewards)
+    if summary is not None:
+        summary = dict(summary)
+    elif avg_rewards is not None and std_rewards is not None:
+        summary = {} # média e desvio já prontos: sem passar por todas as runs de novo
+    else:
+        summary = summarize_runs(all_rewards)
+    if avg_rewards is not None:
+        summary["mean"] = np.asarray(avg_rewards)
+    if std_rewards is not None:
+        summary["std"] = np.asarray(std_rewards)
+
+    fig, ax = plt.subplots(figsize=(10, 6))
+    # runs individuais em baixa opacidade, todas numa única coleção
+    runs = all_rewards[np.unique(np.linspace(0, len(all_rewards) - 1, min(max_runs, len(all_rewards))).astype(int))]
+    x, y = minmax_downsample(runs, max_points)
+    colors = plt.cm.viridis(np.linspace(0, 1, len(runs)))
+    ax.add_collection(LineCollection(np.stack([x, y], axis=-1), colors=colors, alpha=0.15))
+    # média com intervalo de confiança (e faixa 5%-95% se disponível)
+    mean, std = summary["mean"], summary["std"]
+    x_mean, mean_ds = _bucket_reduce(mean, max_points, np.nanmean)
+    _, lower = _bucket_reduce(mean - std, max_points, np.nanmin)
+    _, upper = _bucket_reduce(mean + std, max_points, np.nanmax)
+    if "q0.05" in summary and "q0.95" in summary:
+        _, q_low = _bucket_reduce(summary["q0.05"], max_points, np.nanmin)
+        _, q_high = _bucket_reduce(summary["q0.95"], max_points, np.nanmax)
+        ax.fill_between(x_mean, q_low, q_high, alpha=0.08, color='red', label="5%-95%")
+    ax.plot(x_mean, mean_ds, linewidth=2, color='red', label="Average")
+    ax.fill_between(x_mean, lower, upper, alpha=0.2, color='red')
+    ax.autoscale_view()
     # título e rótulos do plot
     plt.title("Training Rewards Over Multiple Runs")
     plt.xlabel("Epoch")
@@ -46,7 +156,7 @@ def save_fig_multiple_rewards(all_rewards: np.ndarray, avg_rewards: np.ndarray,
     #plt.grid(True, alpha=0.3)
     plt.tight_layout()
     plt.savefig("rewards_multiple_runs.png")
-    plt.close()
+    plt.close(fig)
 
 
 def save_fig_action_distribution(action_count) -> None:
@@ -55,6 +165,7 @@ def save_fig_action_distribution(action_count) -> None:
     Args:
         action_count (dict[str, int]): dict with action counts.
     """
+    plt, sns = _pyplot()
     plt.figure(figsize=(10, 5))
     sns.barplot(x=list(action_count.keys()), y=list(action_count.values()))
     plt.title("Action Distribution")
@@ -84,6 +195,7 @@ def save_fig_optimal_policy_heatmap(optimal_policy) -> None:
     Args:
         optimal_policy (np.ndarray): Q-value table (2x3) for the agent.
     """
+    plt, sns = _pyplot()
     plt.figure(figsize=(8, 6))
     # labels
     action_names = ["Search", "Wait", "Recharge"]
@@ -0,0 +1,98 @@
+"""Vectorized episode bookkeeping for rollouts over a vectorized multi-agent env."""
+
+import numpy as np
+
+
+class EpisodeTracker:
+    def __init__(self, num_envs: int, agent_ids: list[str], capacity: int = 1024) -> None:
+        """Per-env episode scores, lengths and done masks kept in fixed arrays
+
+        `step` folds one vectorized env step into the running episodes with array ops and
+        finishes every env whose episode ended (any agent terminated or truncated) with
+        boolean masking. Finished episodes are buffered as records and handed out in
+        batches by `drain`.
+
+        Args:
+            num_envs (int): envs of the vectorized env.
+            agent_ids (list[str]): agent names, in the order of `agent_scores`.
+            capacity (int): initial number of buffered records (doubles when full).
+        """
+        self.num_envs = num_envs
+        self.agent_ids = list(agent_ids)
+        n_agents = len(self.agent_ids)
+        self.agent_scores = np.zeros((num_envs, n_agents)) # recompensa acumulada por agente
+        self.lengths = np.zeros(num_envs, dtype=np.int64)
+        self.done = np.zeros(num_envs, dtype=bool) # envs que terminaram no último passo
+        self._rewards = np.empty((n_agents, num_envs))
+        self._flags = np.empty((2 * n_agents, num_envs), dtype=bool)
+        self.dtype = np.dtype([
+            ("env", "<i8"),
+            ("score", "<f8"),
+            ("length", "<i8"),
+            ("agent_scores", "<f8", (n_agents,)),
+        ])
+        self._records = np.empty(capacity, dtype=self.dtype)
+        self._n = 0
+
+    @property
+    def scores(self) -> np.ndarray:
+        """Running episode score of each env (sum over agents)"""
+        return self.agent_scores.sum(axis=1)
+
+    def reset(self) -> None:
+        """Drop the running episodes and the buffered records (e.g. after env.reset())"""
+        self.agent_scores.fill(0)
+        self.lengths.fill(0)
+        self.done.fill(False)
+        self._n = 0
+
+    def step(self, reward: dict, termination: dict, truncation: dict) -> np.ndarray:
+        """Account one vectorized env step
+
+        Args:
+            reward (dict): agent_id -> reward of each env, shape (num_envs,).
+            termination (dict): agent_id -> termination flag of each env.
+            truncation (dict): agent_id -> truncation flag of each env.
+
+        Returns:
+            np.ndarray: indices of the envs whose episode finished at this step.
+        """
+        n_agents = len(self.agent_ids)
+        for k, agent_id in enumerate(self.agent_ids):
+            self._rewards[k] = reward[agent_id]
+            self._flags[k] = termination[agent_id]
+            self._flags[n_agents + k] = truncation[agent_id]
+        self.agent_scores += self._rewards.T
+        self.lengths += 1
+        np.any(self._flags, axis=0, out=self.done)
+
+        finished = np.flatnonzero(self.done)
+        if finished.size:
+            self._record(finished)
+            self.agent_scores[finished] = 0
+            self.lengths[finished] = 0
+        return finished
+
+    def _record(self, finished: np.ndarray) -> None:
+        """Buffer the episodes of the finished envs"""
+        end = self._n + finished.size
+        if end > len(self._records):
+            grown = np.empty(max(2 * len(self._records), end), dtype=self.dtype)
+            grown[:self._n] = self._records[:self._n]
+            self._records = grown
+        records = self._records[self._n:end]
+        records["env"] = finished
+        records["agent_scores"] = self.agent_scores[finished]
+        records["score"] = records["agent_scores"].sum(axis=1)
+        records["length"] = self.lengths[finished]
+        self._n = end
+
+    def drain(self) -> np.ndarray:
+        """Finished episodes since the last drain, in completion order
+
+        Returns:
+            np.ndarray: records with fields env, score, length and agent_scores.
+        """
+        records = self._records[:self._n].copy()
+        self._n = 0
+        return records
@@ -0,0 +1,282 @@
+"""Population fitness evaluation on dedicated eval envs.
+
+Each worker process owns its own vectorized eval env and scores one population member at
+a time, so the whole population is evaluated concurrently instead of one `agent.test`
+after the other on the training env. Fitnesses can be memoized by policy, so unchanged
+members are not evaluated again.
+"""
+
+import hashlib
+from collections import OrderedDict
+
+import numpy as np
+import torch
+
+from agilerl.utils.utils import make_multi_agent_vect_envs
+
+from episodes import EpisodeTracker
+from workers import WorkerPool, load_policy_state, policy_state
+
+
+def evaluate_fitness(agent, env, loop: int, max_steps: int | None = None, seed: int | None = None) -> float:
+    """Mean score of the agent over `loop` rounds of one episode per env, like agent.test
+
+    Each round resets every env and runs until all of them finished their episode (all
+    agents terminated or truncated, or max_steps reached), masking finished envs out of
+    the score. Round k resets env i with seed `seed + k * num_envs + i`, so every agent
+    is scored on the same episodes. Unlike agent.test, it does not touch agent.fitness.
+
+    Args:
+        agent (MATD3): agent to evaluate (switched to eval mode).
+        env: vectorized env.
+        loop (int): rounds; the fitness is the mean over rounds of the mean over envs.
+        max_steps (int, optional): steps after which an episode counts as finished.
+        seed (int, optional): base reset seed (None = unseeded, like agent.test).
+
+    Returns:
+        float: fitness.
+    """
+    agent.set_training_mode(False)
+    num_envs = env.num_envs
+    n_agents = len(agent.agent_ids)
+    rewards = np.empty((n_agents, num_envs))
+    dones = np.empty((n_agents, num_envs), dtype=bool)
+    round_scores = []
+    with torch.no_grad():
+        for k in range(loop):
+            obs, info = env.reset(seed=None if seed is None else seed + k * num_envs)
+            scores = np.zeros(num_envs)
+            completed = np.zeros(num_envs)
+            finished = np.zeros(num_envs, dtype=bool)
+            step = 0
+            while not finished.all():
+                step += 1
+                action, _ = agent.get_action(obs, infos=info)
+                obs, reward, term, trunc, info = env.step(action)
+                for j, agent_id in enumerate(agent.agent_ids):
+                    rewards[j] = reward[agent_id]
+                    # NaN marca agente inativo: recompensa 0 e conta como terminado
+                    terminated = np.asarray(term.get(agent_id, True), dtype=float)
+                    truncated = np.asarray(trunc.get(agent_id, False), dtype=float)
+                    dones[j] = np.where(np.isnan(terminated), True, terminated.astype(bool))
+                    dones[j] |= np.nan_to_num(truncated).astype(bool)
+                scores += np.nan_to_num(rewards).sum(axis=0)
+                done = dones.all(axis=0)
+                if max_steps is not None and step == max_steps:
+                    done[:] = True
+                newly = done & ~finished
+                completed[newly] = scores[newly]
+                finished |= newly
+            round_scores.append(completed.mean())
+    return float(np.mean(round_scores))
+
+
+def collect_episodes(agent, env, episodes: int, seed: int | None = None) -> np.ndarray:
+    """Run the agent greedily on an auto-resetting vectorized env until `episodes` episodes finish
+
+    Actions for all envs come from one batched get_action per step.
+
+    Args:
+        agent (MATD3): agent to run (switched to eval mode).
+        env: vectorized env that resets each env when its episode ends.
+        episodes (int): episodes to collect.
+        seed (int, optional): seed of the initial reset.
+
+    Returns:
+        np.ndarray: the first `episodes` EpisodeTracker records (env, score, length, agent_scores).
+    """
+    agent.set_training_mode(False)
+    tracker = EpisodeTracker(env.num_envs, agent.agent_ids, capacity=episodes + env.num_envs)
+    batches = []
+    finished = 0
+    obs, info = env.reset(seed=seed)
+    with torch.no_grad():
+        while finished < episodes:
+            action, _ = agent.get_action(obs, infos=info)
+            obs, reward, termination, truncation, info = env.step(action)
+            if tracker.step(reward, termination, truncation).size:
+                batches.append(tracker.drain())
+                finished += len(batches[-1])
+    return np.concatenate(batches)[:episodes]
+
+
+def reward_stats(records: np.ndarray, agent_ids: list[str],
+                 quantiles: tuple[float, ...] = (0.05, 0.25, 0.5, 0.75, 0.95)) -> dict[str, dict[str, float]]:
+    """Distribution of episode rewards per agent and of the summed score
+
+    Args:
+        records (np.ndarray): EpisodeTracker records.
+        agent_ids (list[str]): agent names, in the order of the records' agent_scores.
+        quantiles (tuple[float, ...]): quantiles to report.
+
+    Returns:
+        dict: agent_id (and "total") -> {"mean", "std", "min", "max", "q05", ...}.
+    """
+    columns = dict(zip(agent_ids, records["agent_scores"].T))
+    columns["total"] = records["score"]
+    stats = {}
+    for name, values in columns.items():
+        stats[name] = {"mean": float(values.mean()), "std": float(values.std()),
+                       "min": float(values.min()), "max": float(values.max())}
+        for q, value in zip(quantiles, np.quantile(values, quantiles)):
+            stats[name][f"q{round(q * 100):02d}"] = float(value)
+    return stats
+
+
+def policy_key(agent, hp_names: list[str] = ()) -> str:
+    """Hash of the agent's actor weights (names, shapes and values) and hyperparameters
+
+    Args:
+        agent (MATD3): population member.
+        hp_names (list[str]): hyperparameter attributes to include (e.g. hp_config.names()).
+
+    Returns:
+        str: hex digest.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    # só os atores definem a política avaliada; críticos não mudam a fitness
+    for name, tensor in agent.actors.state_dict().items():
+        digest.update(f"{name}{tuple(tensor.shape)}{tensor.dtype}".encode())
+        digest.update(tensor.detach().cpu().contiguous().numpy().tobytes())
+    digest.update(repr([(name, getattr(agent, name)) for name in hp_names]).encode())
+    return digest.hexdigest()
+
+
+class FitnessCache:
+    def __init__(self, max_entries: int = 64, reeval_interval: int | None = 5) -> None:
+        """Least-recently-used memo of fitness by policy key
+
+        A cached fitness is served at most `reeval_interval` times; the next lookup misses,
+        so the policy is evaluated again and the entry refreshed, which keeps a single
+        noisy evaluation from sticking to a member forever. With seeded eval resets the
+        evaluation is deterministic and re-evaluating only repeats the same score, so pass
+        reeval_interval=None there.
+
+        Args:
+            max_entries (int): entries kept; the least recently used is evicted first.
+            reeval_interval (int, optional): cache hits before forcing a re-evaluation
+                (None = never, 0 = no caching).
+        """
+        self.max_entries = max_entries
+        self.reeval_interval = reeval_interval
+        self.entries: OrderedDict[str, list] = OrderedDict() # chave -> [fitness, hits]
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> float | None:
+        """Cached fitness of the policy, or None if it has to be evaluated"""
+        entry = self.entries.get(key)
+        if entry is None or (self.reeval_interval is not None and entry[1] >= self.reeval_interval):
+            self.misses += 1
+            return None
+        entry[1] += 1
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return entry[0]
+
+    def put(self, key: str, fitness: float) -> None:
+        """Store a fresh evaluation, evicting the least recently used entries over max_entries"""
+        self.entries[key] = [fitness, 0]
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+
+class _EvalWorker:
+    def __init__(self, make_env, make_agent, num_envs: int, loop: int, max_steps: int | None,
+                 seed: int | None) -> None:
+        """Per-process eval state: a vectorized eval env and an agent that loads each member's policy"""
+        self.env = make_multi_agent_vect_envs(env=make_env, num_envs=num_envs)
+        self.agent = make_agent()
+        self.loop = loop
+        self.max_steps = max_steps
+        self.seed = seed
+
+    def __call__(self, policy: dict) -> float:
+        load_policy_state(self.agent, policy)
+        return evaluate_fitness(self.agent, self.env, self.loop, self.max_steps, self.seed)
+
+    def close(self) -> None:
+        self.env.close()
+
+
+class PopulationEvaluator:
+    def __init__(self, make_env, make_agent, num_envs: int, num_workers: int, loop: int,
+                 max_steps: int | None = None, seed: int | None = 0, cache: FitnessCache | None = None,
+                 hp_names: list[str] = (), timeout: float | None = None) -> None:
+        """Scores the population concurrently on a pool of dedicated eval envs
+
+        Each worker builds one agent with `make_agent` and loads into it the actor weights of
+        the member it scores. With num_workers=0 the members themselves are evaluated one
+        after the other in the main process, still on a dedicated eval env and with the fixed
+        seeds. With a cache, members whose policy key has a cached fitness are not evaluated,
+        and identical members of the same population are evaluated once.
+
+        Args:
+            make_env (callable): picklable env constructor (a module-level function).
+            make_agent (callable): picklable constructor of a CPU agent with the population's spaces.
+            num_envs (int): envs in each eval vectorized env.
+            num_workers (int): worker processes (0 = evaluate in the main process).
+            loop (int): evaluation rounds of one episode per env.
+            max_steps (int, optional): steps after which an episode counts as finished.
+            seed (int, optional): base reset seed shared by all members (None = unseeded).
+            cache (FitnessCache, optional): fitness memo (None = evaluate every member).
+            hp_names (list[str]): hyperparameters that are part of the cache key.
+            timeout (float, optional): seconds to wait for each worker result (None = no limit).
+        """
+        self.loop = loop
+        self.cache = cache
+        self.hp_names = list(hp_names)
+        self.max_steps = max_steps
+        self.seed = seed
+        self.env = None
+        self.pool = None
+        if num_workers == 0:
+            self.env = make_multi_agent_vect_envs(env=make_env, num_envs=num_envs)
+        else:
+            self.pool = WorkerPool(_EvalWorker, (make_env, make_agent, num_envs, loop, max_steps, seed),
+                                   num_workers, timeout)
+
+    def evaluate(self, pop: list) -> list[float]:
+        """Fitness of every member, appended to its agent.fitness as agent.test does
+
+        Args:
+            pop (list): population.
+
+        Returns:
+            list[float]: fitnesses in population order (what TournamentSelection ranks).
+        """
+        if self.cache is None:
+            fitnesses = self._evaluate(pop)
+        else:
+            keys = [policy_key(agent, self.hp_names) for agent in pop]
+            cached = {}
+            pending = {} # chave -> primeiro membro com ela, avaliado uma vez só
+            for agent, key in zip(pop, keys):
+                if key in cached or key in pending:
+                    continue
+                fitness = self.cache.get(key)
+                if fitness is None:
+                    pending[key] = agent
+                else:
+                    cached[key] = fitness
+            for key, fitness in zip(pending, self._evaluate(list(pending.values()))):
+                self.cache.put(key, fitness)
+                cached[key] = fitness
+            fitnesses = [cached[key] for key in keys]
+        for agent, fitness in zip(pop, fitnesses):
+            agent.fitness.append(fitness)
+        return fitnesses
+
+    def _evaluate(self, members: list) -> list[float]:
+        """Evaluate members on the eval envs, in order"""
+        if self.env is not None:
+            return [evaluate_fitness(agent, self.env, self.loop, self.max_steps, self.seed) for agent in members]
+        return self.pool.map([policy_state(agent) for agent in members])
+
+    def close(self) -> None:
+        """Stop the workers and close the eval envs"""
+        if self.env is not None:
+            self.env.close()
+        if self.pool is not None:
+            self.pool.close()
@@ -0,0 +1,132 @@
+"""CPU learner path for MATD3: thread settings, fused learn calls, prioritized replay and throughput stats."""
+
+import time
+
+import numpy as np
+import torch
+
+
+def configure_cpu_threads(num_threads: int, interop_threads: int | None = None) -> int:
+    """Set the number of threads torch uses for the learner's ops on CPU
+
+    Args:
+        num_threads (int): intra-op threads (matmuls, elementwise ops).
+        interop_threads (int, optional): inter-op threads.
+
+    Returns:
+        int: intra-op threads in effect.
+    """
+    torch.set_num_threads(num_threads)
+    if interop_threads is not None:
+        try:
+            torch.set_num_interop_threads(interop_threads)
+        except RuntimeError:
+            pass # só pode ser definido antes de qualquer trabalho paralelo do torch
+    return torch.get_num_threads()
+
+
+class WeightedMSELoss:
+    def __init__(self, weights: torch.Tensor) -> None:
+        """Importance-weighted MSE standing in for agent.criterion during a prioritized learn
+
+        MATD3.learn computes every critic loss through `agent.criterion(q, target)`, so
+        swapping it in gives the weighted loss and the TD errors of the batch without
+        another forward pass.
+
+        Args:
+            weights (torch.Tensor): importance-sampling weights, shape (batch_size, 1).
+        """
+        self.weights = weights
+        self.td_errors: list[torch.Tensor] = [] # |alvo - Q| de cada crítico de cada agente
+
+    def __call__(self, q_value: torch.Tensor, target: torch.Tensor) -> torch.Tensor:
+        td_error = target - q_value
+        self.td_errors.append(td_error.detach().abs())
+        return (self.weights * td_error.pow(2)).mean()
+
+    def priorities(self) -> np.ndarray:
+        """Mean absolute TD error per sample over all critics seen, shape (batch_size,)"""
+        return torch.stack(self.td_errors).mean(dim=0).reshape(-1).cpu().numpy()
+
+
+class Learner:
+    def __init__(self, fuse: int = 1) -> None:
+        """Runs an agent's learn calls, optionally fused, and measures learner throughput
+
+        With fuse=k, every k consecutive learn calls become one `agent.learn` on a k times
+        larger batch: the same number of samples in fewer, larger matmuls, which uses CPU
+        threads much better than small batches. That also means k times fewer gradient
+        and target-network steps, so fuse=1 keeps the original update schedule.
+
+        With a buffer that has `sample_prioritized` (PrioritizedReplayBuffer), batches are
+        sampled by priority, the critic losses are weighted by the importance-sampling
+        weights, and the sampled priorities are updated from the new TD errors.
+
+        Args:
+            fuse (int): learn calls merged into each update.
+        """
+        self.fuse = fuse
+        self.pending = 0 # learns pedidos ainda não executados
+        self.updates = 0
+        self.samples = 0
+        self.seconds = 0.0
+
+    def learn(self, agent, memory, calls: int = 1) -> None:
+        """Request `calls` learn calls, running them in groups of `fuse`
+
+        Args:
+            agent (MATD3): agent to update.
+            memory: replay buffer to sample from.
+            calls (int): learn calls of agent.batch_size samples.
+        """
+        self.pending += calls
+        while self.pending >= self.fuse:
+            self._update(agent, memory, self.fuse)
+            self.pending -= self.fuse
+
+    def flush(self, agent, memory) -> None:
+        """Run the calls still pending (call it before switching to another agent)"""
+        if self.pending:
+            self._update(agent, memory, self.pending)
+            self.pending = 0
+
+    def _update(self, agent, memory, calls: int) -> None:
+        """One agent.learn on calls * batch_size samples"""
+        batch_size = min(calls * agent.batch_size, len(memory))
+        start = time.perf_counter()
+        if hasattr(memory, "sample_prioritized"):
+            experiences, weights, indices = memory.sample_prioritized(batch_size)
+            criterion, agent.criterion = agent.criterion, WeightedMSELoss(weights)
+            try:
+                agent.learn(experiences)
+                memory.update_priorities(indices, agent.criterion.priorities())
+            finally:
+                agent.criterion = criterion
+        else:
+            experiences = memory.sample(batch_size)
+            agent.learn(experiences)
+        self.seconds += time.perf_counter() - start
+        self.updates += 1
+        self.samples += batch_size
+
+    def reset_stats(self) -> None:
+        """Zero the throughput counters"""
+        self.updates = 0
+        self.samples = 0
+        self.seconds = 0.0
+
+    def report(self, env_steps: int, env_seconds: float) -> str:
+        """Learner and env throughput since the last `reset_stats`
+
+        Args:
+            env_steps (int): env steps collected over the same period.
+            env_seconds (float): wall-clock time spent collecting them.
+
+        Returns:
+            str: updates/sec, samples/sec and env steps/sec.
+        """
+        updates_per_sec = self.updates / self.seconds if self.seconds > 0 else 0.0
+        samples_per_sec = self.samples / self.seconds if self.seconds > 0 else 0.0
+        steps_per_sec = env_steps / env_seconds if env_seconds > 0 else 0.0
+        return (f"Learner: {updates_per_sec:.1f} updates/s, {samples_per_sec:,.0f} samples/s "
+                f"({self.seconds:.1f}s) | Env: {steps_per_sec:,.0f} steps/s")
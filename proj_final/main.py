@@ -4,6 +4,8 @@ Authors: Michael (https://github.com/mikepratt1), Nickua (https://github.com/nic
 """
 
 import os
+import time
+from functools import partial
 
 import matplotlib.pyplot as plt
 import numpy as np
@@ -13,7 +15,6 @@ from mpe2 import simple_speaker_listener_v4
 
 from agilerl.algorithms import MATD3
 from agilerl.algorithms.core.registry import HyperparameterConfig, RLParameter
-from agilerl.components.multi_agent_replay_buffer import MultiAgentReplayBuffer
 from agilerl.hpo.mutation import Mutations
 from agilerl.hpo.tournament import TournamentSelection
 from agilerl.algorithms.core.registry import NetworkGroup
@@ -23,6 +24,24 @@ from agilerl.utils.utils import (
     make_multi_agent_vect_envs,
 )
 
+from episodes import EpisodeTracker
+from evaluation import FitnessCache, PopulationEvaluator
+from learner import Learner, configure_cpu_threads
+from replay_buffer import PrioritizedReplayBuffer, SharedReplayBuffer
+from rollout import ParallelRollout, count_learn_calls
+
+
+def make_env():
+    # nível de módulo para poder ser enviado aos workers de rollout
+    return simple_speaker_listener_v4.parallel_env(continuous_actions=True)
+
+
+def make_agent(observation_spaces, action_spaces, net_config, init_hp, num_envs):
+    # agente de CPU de cada worker de rollout e de avaliação, que só recebe os pesos dos atores de cada membro
+    return create_population("MATD3", observation_spaces, action_spaces, net_config, init_hp,
+                             population_size=1, num_envs=num_envs, device="cpu")[0]
+
+
 if __name__ == "__main__":
     # device = "cuda" if torch.cuda.is_available() else "cpu"
     device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
@@ -52,16 +71,43 @@ if __name__ == "__main__":
         "LR_CRITIC": 1e-3,
         "GAMMA": 0.99,
         "MEMORY_SIZE": 250000,
+        # prioritized experience replay (PER): α da prioridade, β inicial e learns até β = 1
+        "PER": False,
+        "PER_ALPHA": 0.6,
+        "PER_BETA": 0.4,
+        "PER_BETA_STEPS": 200_000,
         "LEARN_STEP": 8,
         "TAU": 0.005,
         "POLICY_FREQ": 4,
         "MAX_GRAD_NORM": 10.0,
+        # processos de rollout em paralelo, cada um com seu próprio vectorized env (0 = loop serial)
+        "ROLLOUT_WORKERS": min(5, os.cpu_count() or 1),
+        # threads do learner na CPU (None = todos os núcleos: o learn roda depois da coleta, sem disputar com os workers)
+        "LEARNER_THREADS": None,
+        # learns consecutivos fundidos num único batch maior (1 = um learn por chamada)
+        "LEARN_FUSE": 1,
+        # modo do torch.compile para as redes: None, "default", "reduce-overhead" ou "max-autotune"
+        # (só o learner usa as redes compiladas: os workers de rollout e de avaliação recebem os pesos
+        # dos atores e agem com o próprio agente, sem compilar)
+        "TORCH_COMPILE": None,
+        # processos de avaliação, cada um com seu próprio vectorized env de avaliação (0 = no processo principal)
+        "EVAL_WORKERS": min(5, os.cpu_count() or 1),
+        "EVAL_ENVS": 8,
+        # seed base dos resets de avaliação, igual para todos os membros (None = sem seed)
+        "EVAL_SEED": 0,
+        # cache de fitness por hash dos pesos + hiperparâmetros: entradas (0 = sem cache). Desligado porque
+        # todo membro aprende a cada geração e as chaves não se repetem: a taxa de hits esperada aqui é ~0
+        # (só membros que passam uma geração inteira sem aprender, com learning_delay >= evo_steps, acertariam)
+        "FITNESS_CACHE_SIZE": 0,
+        # hits até reavaliar; só vale com EVAL_SEED = None, com seed fixa a avaliação é determinística
+        "FITNESS_REEVAL_INTERVAL": 5,
     }
 
-    num_envs = 8
+    if device.type == "cpu":
+        learner_threads = INIT_HP["LEARNER_THREADS"] or os.cpu_count() or 1
+        print(f"CPU learner with {configure_cpu_threads(learner_threads)} threads")
 
-    def make_env():
-        return simple_speaker_listener_v4.parallel_env(continuous_actions=True)
+    num_envs = 8
 
     env = make_multi_agent_vect_envs(env=make_env, num_envs=num_envs)
 
@@ -94,16 +140,29 @@ if __name__ == "__main__":
         population_size=INIT_HP["POPULATION_SIZE"],
         num_envs=num_envs,
         device=device,
+        torch_compiler=INIT_HP["TORCH_COMPILE"],
     )
 
-    # Configure the multi-agent replay buffer
-    field_names = ["obs", "action", "reward", "next_obs", "done"]
-    memory = MultiAgentReplayBuffer(
-        INIT_HP["MEMORY_SIZE"],
-        field_names=field_names,
-        agent_ids=INIT_HP["AGENT_IDS"],
-        device=device,
-    )
+    # Configure the multi-agent replay buffer (shared memory, written directly by the rollout workers)
+    if INIT_HP["PER"]:
+        memory = PrioritizedReplayBuffer(
+            INIT_HP["MEMORY_SIZE"],
+            agent_ids=INIT_HP["AGENT_IDS"],
+            observation_spaces=observation_spaces,
+            action_spaces=action_spaces,
+            alpha=INIT_HP["PER_ALPHA"],
+            beta=INIT_HP["PER_BETA"],
+            beta_steps=INIT_HP["PER_BETA_STEPS"],
+            device=device,
+        )
+    else:
+        memory = SharedReplayBuffer(
+            INIT_HP["MEMORY_SIZE"],
+            agent_ids=INIT_HP["AGENT_IDS"],
+            observation_spaces=observation_spaces,
+            action_spaces=action_spaces,
+            device=device,
+        )
 
     # Instantiate a tournament selection object (used for HPO)
     tournament = TournamentSelection(
@@ -145,174 +204,210 @@ if __name__ == "__main__":
     # best agent hist
     best_fitness_history = []
 
-    # TRAINING LOOP
-    print("Training...")
-    pbar = default_progress_bar(max_steps)
-    while np.less([agent.steps[-1] for agent in pop], max_steps).all():
-        pop_episode_scores = []
-        for agent in pop:  # Loop through population
-            agent.set_training_mode(True)
-            obs, info = env.reset()  # Reset environment at start of episode
-            scores = np.zeros(num_envs)
-            completed_episode_scores = []
-            steps = 0
-            for idx_step in range(evo_steps // num_envs):
-                action, raw_action = agent.get_action(
-                    obs=obs, infos=info
-                )  # Predict action
-                next_obs, reward, termination, truncation, info = env.step(
-                    action
-                )  # Act in environment
-
-                # --- NOISE DECAY ---
-                decay_progress = min(total_steps / noise_decay, 1.0)
-                explNoise = noise_start + decay_progress * (noise_end - noise_start)
-                agent.EXPL_NOISE = explNoise
-
-                scores += np.sum(np.array(list(reward.values())).transpose(), axis=-1)
-                total_steps += num_envs
-                steps += num_envs
-
-                # Save experiences to replay buffer
-                memory.save_to_memory(
-                    obs,
-                    raw_action,
-                    reward,
-                    next_obs,
-                    termination,
-                    is_vectorised=True,
-                )
-
-                # Learn according to learning frequency
-                # Handle learn steps > num_envs
-                if agent.learn_step > num_envs:
-                    learn_step = agent.learn_step // num_envs
-                    if (
-                        idx_step % learn_step == 0
-                        and len(memory) >= agent.batch_size
-                        and memory.counter > learning_delay
-                    ):
-                        experiences = memory.sample(
-                            agent.batch_size
-                        )  # Sample replay buffer
-                        agent.learn(
-                            experiences
-                        )  # Learn according to agent's RL algorithm
-
-                # Handle num_envs > learn step; learn multiple times per step in env
-                elif (
-                    len(memory) >= agent.batch_size and memory.counter > learning_delay
-                ):
-                    for _ in range(num_envs // agent.learn_step):
-                        experiences = memory.sample(
-                            agent.batch_size
-                        )  # Sample replay buffer
-                        agent.learn(
-                            experiences
-                        )  # Learn according to agent's RL algorithm
-
-                obs = next_obs
-
-                # Calculate scores and reset noise for finished episodes
-                reset_noise_indices = []
-                term_array = np.array(list(termination.values())).transpose()
-                trunc_array = np.array(list(truncation.values())).transpose()
-                for idx, (d, t) in enumerate(zip(term_array, trunc_array)):
-                    if np.any(d) or np.any(t):
-                        completed_episode_scores.append(scores[idx])
-                        agent.scores.append(scores[idx])
-                        scores[idx] = 0
-                        reset_noise_indices.append(idx)
-
-                agent.reset_action_noise(reset_noise_indices)
-
-            pbar.update(evo_steps // len(pop))
-
-            agent.steps[-1] += steps
-            pop_episode_scores.append(completed_episode_scores)
-
-        # Evaluate population
-        fitnesses = [
-            agent.test(
-                env,
-                max_steps=eval_steps,
-                loop=eval_loop,
+    learner = Learner(fuse=INIT_HP["LEARN_FUSE"])
+
+    # os workers constroem o próprio agente uma vez
+    agent_factory = partial(make_agent, observation_spaces, action_spaces, NET_CONFIG, INIT_HP, num_envs)
+    rollout = None
+    evaluator = None
+    try:
+        if INIT_HP["ROLLOUT_WORKERS"] > 0:
+            rollout = ParallelRollout(
+                make_env,
+                agent_factory,
+                num_envs=num_envs,
+                num_workers=INIT_HP["ROLLOUT_WORKERS"],
+                n_steps=evo_steps // num_envs,
             )
-            for agent in pop
-        ]
-        mean_scores = [
-            (
-                np.mean(episode_scores)
-                if len(episode_scores) > 0
-                else 0
-            )
-            for episode_scores in pop_episode_scores
-        ]
+
+        # Dedicated eval envs, scoring the whole population concurrently
+        evaluator = PopulationEvaluator(
+            make_env,
+            agent_factory,
+            num_envs=INIT_HP["EVAL_ENVS"],
+            num_workers=INIT_HP["EVAL_WORKERS"],
+            loop=eval_loop,
+            max_steps=eval_steps,
+            seed=INIT_HP["EVAL_SEED"],
+            cache=(
+                FitnessCache(INIT_HP["FITNESS_CACHE_SIZE"],
+                             INIT_HP["FITNESS_REEVAL_INTERVAL"] if INIT_HP["EVAL_SEED"] is None else None)
+                if INIT_HP["FITNESS_CACHE_SIZE"] > 0 else None
+            ),
+            hp_names=hp_config.names(),
+        )
+
+        # TRAINING LOOP
+        print("Training...")
+        pbar = default_progress_bar(max_steps)
+        while np.less([agent.steps[-1] for agent in pop], max_steps).all():
+            pop_episode_scores = []
+            learner.reset_stats()
+            generation_start, generation_steps = time.perf_counter(), total_steps
+            if rollout is not None:
+                # Collect the whole population concurrently, then learn in the main process
+                results = rollout.collect(pop, memory, total_steps, (noise_start, noise_end, noise_decay))
+                for agent, completed_episode_scores in zip(pop, results):
+                    steps = rollout.n_steps * num_envs
+                    total_steps += steps
+                    if len(memory) >= agent.batch_size and memory.counter > learning_delay:
+                        learner.learn(agent, memory, count_learn_calls(agent, rollout.n_steps, num_envs))
+                        learner.flush(agent, memory)
+                    agent.scores.extend(completed_episode_scores)
+                    pbar.update(evo_steps // len(pop))
+                    agent.steps[-1] += steps
+                    pop_episode_scores.append(completed_episode_scores)
+            else:
+                for agent in pop:  # Loop through population
+                    agent.set_training_mode(True)
+                    obs, info = env.reset()  # Reset environment at start of episode
+                    episodes = EpisodeTracker(num_envs, env.agents)
+                    steps = 0
+                    for idx_step in range(evo_steps // num_envs):
+                        action, raw_action = agent.get_action(
+                            obs=obs, infos=info
+                        )  # Predict action
+                        next_obs, reward, termination, truncation, info = env.step(
+                            action
+                        )  # Act in environment
+
+                        # --- NOISE DECAY ---
+                        decay_progress = min(total_steps / noise_decay, 1.0)
+                        explNoise = noise_start + decay_progress * (noise_end - noise_start)
+                        agent.EXPL_NOISE = explNoise
+
+                        total_steps += num_envs
+                        steps += num_envs
+
+                        # Save experiences to replay buffer
+                        memory.save_to_memory(
+                            obs,
+                            raw_action,
+                            reward,
+                            next_obs,
+                            termination,
+                            is_vectorised=True,
+                        )
+
+                        # Learn according to learning frequency
+                        # Handle learn steps > num_envs
+                        if agent.learn_step > num_envs:
+                            learn_step = agent.learn_step // num_envs
+                            if (
+                                idx_step % learn_step == 0
+                                and len(memory) >= agent.batch_size
+                                and memory.counter > learning_delay
+                            ):
+                                learner.learn(agent, memory)  # Sample replay buffer and learn
+
+                        # Handle num_envs > learn step; learn multiple times per step in env
+                        elif (
+                            len(memory) >= agent.batch_size and memory.counter > learning_delay
+                        ):
+                            learner.learn(agent, memory, num_envs // agent.learn_step)
+
+                        obs = next_obs
+
+                        # Calculate scores and reset noise for finished episodes
+                        agent.reset_action_noise(episodes.step(reward, termination, truncation))
+
+                    learner.flush(agent, memory)  # learns fundidos que sobraram deste agente
+                    completed_episode_scores = episodes.drain()["score"].tolist()
+                    agent.scores.extend(completed_episode_scores)
+                    pbar.update(evo_steps // len(pop))
+
+                    agent.steps[-1] += steps
+                    pop_episode_scores.append(completed_episode_scores)
+
+            # tempo de coleta = tempo da geração até aqui menos o do learner
+            throughput = learner.report(total_steps - generation_steps,
+                                        time.perf_counter() - generation_start - learner.seconds)
+
+            # Evaluate population
+            fitnesses = evaluator.evaluate(pop)
+            mean_scores = [
+                (
+                    np.mean(episode_scores)
+                    if len(episode_scores) > 0
+                    else 0
+                )
+                for episode_scores in pop_episode_scores
+            ]
         
-        # Salvar pontuação média da população para plotagem
-        population_mean_score = np.mean([score for score in mean_scores if isinstance(score, (int, float))])
-        training_scores_history.append(population_mean_score)
-        best_fitness_history.append(max(fitnesses))
-
-        mean_scores_display = [
-            (
-                score if isinstance(score, (int, float))
-                else "0 completed episodes"
+            # Salvar pontuação média da população para plotagem
+            population_mean_score = np.mean([score for score in mean_scores if isinstance(score, (int, float))])
+            training_scores_history.append(population_mean_score)
+            best_fitness_history.append(max(fitnesses))
+
+            mean_scores_display = [
+                (
+                    score if isinstance(score, (int, float))
+                    else "0 completed episodes"
+                )
+                for score in mean_scores
+            ]
+
+            pbar.write(
+                f"--- Global steps {total_steps} ---\n"
+                f"Steps {[agent.steps[-1] for agent in pop]}\n"
+                f"Scores: {mean_scores_display}\n"
+                f"Fitnesses: {['%.2f' % fitness for fitness in fitnesses]}\n"
+                f"5 fitness avgs: {['%.2f' % np.mean(agent.fitness[-5:]) for agent in pop]}\n"
+                f"Mutations: {[agent.mut for agent in pop]}\n"
+                + (f"Fitness cache: {evaluator.cache.hits} hits, {evaluator.cache.misses} misses\n"
+                   if evaluator.cache is not None else "")
+                + f"{throughput}"
             )
-            for score in mean_scores
-        ]
-
-        pbar.write(
-            f"--- Global steps {total_steps} ---\n"
-            f"Steps {[agent.steps[-1] for agent in pop]}\n"
-            f"Scores: {mean_scores_display}\n"
-            f"Fitnesses: {['%.2f' % fitness for fitness in fitnesses]}\n"
-            f"5 fitness avgs: {['%.2f' % np.mean(agent.fitness[-5:]) for agent in pop]}\n"
-            f"Mutations: {[agent.mut for agent in pop]}"
-        )
 
-        # Tournament selection and population mutation
-        elite, pop = tournament.select(pop)
+            # Tournament selection and population mutation
+            elite, pop = tournament.select(pop)
         
-        # Strong elitism: preserve the best agent to prevent catastrophic mutations
-        elite_backup = elite
+            # Strong elitism: preserve the best agent to prevent catastrophic mutations
+            elite_backup = elite
         
-        pop = mutations.mutation(pop)
+            pop = mutations.mutation(pop)
         
-        # Restore elite (never mutate the best agent)
-        pop[0] = elite_backup
-
-        # Update step counter
-        for agent in pop:
-            agent.steps.append(agent.steps[-1])
-
-    # Save the trained algorithm
-    path = "./models/MATD3"
-    filename = "MATD3_trained_agent.pt"
-    os.makedirs(path, exist_ok=True)
-    save_path = os.path.join(path, filename)
-    elite.save_checkpoint(save_path)
+            # Restore elite (never mutate the best agent)
+            pop[0] = elite_backup
+
+            # Update step counter
+            for agent in pop:
+                agent.steps.append(agent.steps[-1])
+
+        # Save the trained algorithm
+        path = "./models/MATD3"
+        filename = "MATD3_trained_agent.pt"
+        os.makedirs(path, exist_ok=True)
+        save_path = os.path.join(path, filename)
+        elite.save_checkpoint(save_path)
     
-    # Plotar e salvar a evolução das pontuações
-    plt.figure(figsize=(12, 6))
-    plt.plot(training_scores_history, linewidth=2)
-    plt.title('Evolução das Pontuações Médias Durante o Treinamento', fontsize=14)
-    plt.xlabel('Iterações de Evolução', fontsize=12)
-    plt.ylabel('Pontuação Média da População', fontsize=12)
-    plt.grid(True, alpha=0.3)
-    plt.tight_layout()
+        # Plotar e salvar a evolução das pontuações
+        plt.figure(figsize=(12, 6))
+        plt.plot(training_scores_history, linewidth=2)
+        plt.title('Evolução das Pontuações Médias Durante o Treinamento', fontsize=14)
+        plt.xlabel('Iterações de Evolução', fontsize=12)
+        plt.ylabel('Pontuação Média da População', fontsize=12)
+        plt.grid(True, alpha=0.3)
+        plt.tight_layout()
     
-    # Salvar o gráfico
-    plot_path = os.path.join(path, "training_scores_evolution.png")
-    plt.savefig(plot_path, dpi=300, bbox_inches='tight')
-    print(f"Gráfico de evolução das pontuações salvo em: {plot_path}")
+        # Salvar o gráfico
+        plot_path = os.path.join(path, "training_scores_evolution.png")
+        plt.savefig(plot_path, dpi=300, bbox_inches='tight')
+        print(f"Gráfico de evolução das pontuações salvo em: {plot_path}")
     
-    # Salvar dados das pontuações em arquivo numpy
-    scores_data_path = os.path.join(path, "training_scores_history.npy")
-    np.save(scores_data_path, np.array(training_scores_history))
-    print(f"Dados das pontuações salvos em: {scores_data_path}")
+        # Salvar dados das pontuações em arquivo numpy
+        scores_data_path = os.path.join(path, "training_scores_history.npy")
+        np.save(scores_data_path, np.array(training_scores_history))
+        print(f"Dados das pontuações salvos em: {scores_data_path}")
     
-    plt.show()
-
-    pbar.close()
-    env.close()
+        plt.show()
+
+        pbar.close()
+    finally:
+        # fecha workers, envs e memória compartilhada mesmo se o treino falhar
+        env.close()
+        if rollout is not None:
+            rollout.close()
+        if evaluator is not None:
+            evaluator.close()
+        memory.close()
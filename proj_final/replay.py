@@ -1,71 +1,84 @@
+import argparse
 import os
+import time
 
-import imageio
-import numpy as np
 import torch
 from pettingzoo.mpe import simple_speaker_listener_v4
-from PIL import Image, ImageDraw
 
 from agilerl.algorithms import MATD3
+from agilerl.utils.utils import make_multi_agent_vect_envs
 
+from evaluation import collect_episodes, reward_stats
+from video import EpisodeLabel, FrameWriter
 
-# Define function to return image
-def _label_with_episode_number(frame, episode_num):
-    im = Image.fromarray(frame)
 
-    drawer = ImageDraw.Draw(im)
+def evaluate_headless(matd3, episodes: int, num_envs: int, max_steps: int, seed: int | None) -> None:
+    """Run many episodes without rendering over a vectorized env and print reward statistics
 
-    if np.mean(frame) < 128:
-        text_color = (255, 255, 255)
-    else:
-        text_color = (0, 0, 0)
-    drawer.text(
-        (im.size[0] / 20, im.size[1] / 18), f"Episode: {episode_num+1}", fill=text_color
+    Args:
+        matd3 (MATD3): loaded agent.
+        episodes (int): episodes to run.
+        num_envs (int): envs of the vectorized env (one batched get_action per step).
+        max_steps (int): steps per episode (env max_cycles).
+        seed (int, optional): seed of the initial reset.
+    """
+    env = make_multi_agent_vect_envs(
+        simple_speaker_listener_v4.parallel_env, num_envs=num_envs, continuous_actions=True, max_cycles=max_steps
     )
+    start = time.perf_counter()
+    records = collect_episodes(matd3, env, episodes, seed=seed)
+    elapsed = time.perf_counter() - start
+    env.close()
 
-    return im
+    print(f"{len(records)} episodes in {elapsed:.1f}s ({len(records) / elapsed:,.1f} episodes/s, {num_envs} envs)")
+    for name, stats in reward_stats(records, matd3.agent_ids).items():
+        print(f"{name:<12} " + "  ".join(f"{key} {value:8.3f}" for key, value in stats.items()))
 
 
-if __name__ == "__main__":
-    device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+def render_replay(matd3, episodes: int, max_steps: int, seed: int | None) -> None:
+    """Play episodes on a rendered env, print their rewards and save them to videos/speaker_listener.gif
 
+    Args:
+        matd3 (MATD3): loaded agent.
+        episodes (int): episodes to play.
+        max_steps (int): max steps per episode.
+        seed (int, optional): seed of the first reset.
+    """
     # Configure the environment
     env = simple_speaker_listener_v4.parallel_env(
         continuous_actions=True, render_mode="rgb_array"
     )
-    env.reset()
+    env.reset(seed=seed)
 
     # Append number of agents and agent IDs to the initial hyperparameter dictionary
     n_agents = env.num_agents
     agent_ids = env.agents
 
-    # Load the saved agent
-    path = "./models/MATD3/MATD3_trained_agent.pt"
-    matd3 = MATD3.load(path, device)
-
-    # Define test loop parameters
-    episodes = 10  # Number of episodes to test agent on
-    max_steps = 25  # Max number of steps to take in the environment in each episode
-
-
     rewards = []  # List to collect total episodic reward
-    frames = []  # List to collect frames
     indi_agent_rewards = {
         agent_id: [] for agent_id in agent_ids
     }  # Dictionary to collect inidivdual agent rewards
 
+    # Frames are encoded into the gif as they are rendered, in a background thread
+    gif_path = "./videos/"
+    os.makedirs(gif_path, exist_ok=True)
+    writer = FrameWriter(os.path.join(gif_path, "speaker_listener.gif"), duration=10, threaded=True)
+
     # Test loop for inference
     for ep in range(episodes):
         obs, info = env.reset()
         agent_reward = {agent_id: 0 for agent_id in agent_ids}
         score = 0
+        label = None
         for _ in range(max_steps):
             # Get next action from agent
             action, _ = matd3.get_action(obs, infos=info)
 
-            # Save the frame for this step and append to frames list
+            # Label the frame for this step and send it to the writer
             frame = env.render()
-            frames.append(_label_with_episode_number(frame, episode_num=ep))
+            if label is None:
+                label = EpisodeLabel(frame, episode_num=ep)
+            writer.append(label.apply(frame))
 
             # Take action in environment
             obs, reward, termination, truncation, info = env.step(
@@ -95,9 +108,26 @@ if __name__ == "__main__":
             print(f"{agent_id} reward: {reward_list[-1]}")
     env.close()
 
-    # Save the gif to specified path
-    gif_path = "./videos/"
-    os.makedirs(gif_path, exist_ok=True)
-    imageio.mimwrite(
-        os.path.join("./videos/", "speaker_listener.gif"), frames, duration=10
-    )
+    # Encode the remaining frames and finish the gif
+    writer.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay or evaluate a trained MATD3 checkpoint")
+    parser.add_argument("--path", default="./models/MATD3/MATD3_trained_agent.pt")
+    parser.add_argument("--no-render", action="store_true", help="headless evaluation over a vectorized env, no gif")
+    parser.add_argument("--episodes", type=int, default=None, help="default: 10 rendered, 1000 headless")
+    parser.add_argument("--num-envs", type=int, default=64, help="vectorized envs for --no-render")
+    parser.add_argument("--max-steps", type=int, default=25)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+
+    # Load the saved agent
+    matd3 = MATD3.load(args.path, device)
+
+    if args.no_render:
+        evaluate_headless(matd3, args.episodes or 1000, args.num_envs, args.max_steps, args.seed)
+    else:
+        render_replay(matd3, args.episodes or 10, args.max_steps, args.seed)
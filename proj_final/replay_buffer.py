@@ -0,0 +1,335 @@
+"""Shared-memory replay buffer for the multi-agent speaker-listener training loop.
+
+Transitions live in preallocated contiguous per-agent NumPy arrays inside a single
+multiprocessing.shared_memory block, so rollout workers in other processes write into
+the buffer directly, and sampling is one gather per array wrapped with torch.from_numpy.
+"""
+
+from multiprocessing import shared_memory
+
+import numpy as np
+import torch
+
+# campos de uma transição, na ordem usada por agent.learn
+FIELDS = ("obs", "action", "reward", "next_obs", "done")
+
+
+class SharedArrays:
+    def __init__(self, layout: dict[str, tuple[tuple[int, ...], str]], name: str | None = None) -> None:
+        """Named numpy arrays packed into a single multiprocessing.shared_memory block
+
+        Args:
+            layout (dict): array name -> (shape, dtype).
+            name (str, optional): attach to this existing block instead of creating one.
+        """
+        self.layout = layout
+        offsets, size = {}, 0
+        for key, (shape, dtype) in layout.items():
+            size = -(-size // 64) * 64 # alinhamento de 64 bytes por array
+            offsets[key] = size
+            size += int(np.prod(shape)) * np.dtype(dtype).itemsize
+        # workers criados por spawn dividem o resource tracker do processo principal, que é
+        # quem cria os blocos e os libera em close(unlink=True)
+        self.shm = shared_memory.SharedMemory(name=name, create=name is None, size=max(size, 1))
+        self.arrays = {
+            key: np.ndarray(shape, dtype=dtype, buffer=self.shm.buf, offset=offsets[key])
+            for key, (shape, dtype) in layout.items()
+        }
+
+    def __getitem__(self, key: str) -> np.ndarray:
+        return self.arrays[key]
+
+    def spec(self) -> tuple[str, dict]:
+        """What another process needs to attach to the block: (name, layout)"""
+        return self.shm.name, self.layout
+
+    def close(self, unlink: bool = False) -> None:
+        """Release the views and the mapping, and free the block if unlink is True"""
+        self.arrays = {}
+        self.shm.close()
+        if unlink:
+            self.shm.unlink()
+
+
+def transition_layout(agent_ids: list[str], observation_spaces: list, action_spaces: list,
+                      rows: int) -> dict[str, tuple[tuple[int, ...], str]]:
+    """Layout of `rows` transitions, one array per field and agent
+
+    Every field is float32, dones included, and rewards and dones are stored as (rows, 1):
+    the dtypes and shapes agent.learn gets from agilerl's MultiAgentReplayBuffer.
+
+    Args:
+        agent_ids (list[str]): agent names.
+        observation_spaces (list): observation space of each agent.
+        action_spaces (list): action space of each agent.
+        rows (int): number of transitions.
+
+    Returns:
+        dict: "field/agent_id" -> (shape, dtype).
+    """
+    layout = {}
+    for agent_id, obs_space, action_space in zip(agent_ids, observation_spaces, action_spaces):
+        layout[f"obs/{agent_id}"] = ((rows, *obs_space.shape), "float32")
+        layout[f"action/{agent_id}"] = ((rows, *action_space.shape), "float32")
+        layout[f"reward/{agent_id}"] = ((rows, 1), "float32")
+        layout[f"next_obs/{agent_id}"] = ((rows, *obs_space.shape), "float32")
+        layout[f"done/{agent_id}"] = ((rows, 1), "float32")
+    return layout
+
+
+def write_transitions(arrays: SharedArrays, start: int, transition: tuple[dict, ...]) -> None:
+    """Write a vectorized transition into ring-buffer rows start, start + 1, ... (wrapping around)
+
+    Args:
+        arrays (SharedArrays): arrays laid out by `transition_layout`.
+        start (int): first row.
+        transition (tuple[dict, ...]): (obs, action, reward, next_obs, done), each a dict
+            agent_id -> values for n envs.
+    """
+    for field, values in zip(FIELDS, transition):
+        for agent_id, value in values.items():
+            dest = arrays[f"{field}/{agent_id}"]
+            value = np.asarray(value)
+            n = len(value)
+            # caso comum sem dar a volta no anel: fatia contígua, sem índices
+            rows = slice(start, start + n) if start + n <= len(dest) else np.arange(start, start + n) % len(dest)
+            dest[rows] = value.reshape(n, *dest.shape[1:])
+
+
+class SharedReplayBuffer:
+    def __init__(self, memory_size: int, agent_ids: list[str], observation_spaces: list, action_spaces: list,
+                 device: str | torch.device | None = None, seed: int | None = None) -> None:
+        """Ring replay buffer with the (obs, action, reward, next_obs, done) contract of agent.learn
+
+        Drop-in for agilerl's MultiAgentReplayBuffer in the training loop (`save_to_memory`,
+        `sample`, `len` and `counter`). Other processes can attach to the same arrays through
+        `spec()` and write the rows handed out by `reserve`. Sampling is uniform with replacement.
+
+        Args:
+            memory_size (int): capacity in transitions.
+            agent_ids (list[str]): agent names.
+            observation_spaces (list): observation space of each agent.
+            action_spaces (list): action space of each agent.
+            device (str or torch.device, optional): device the sampled tensors are moved to.
+            seed (int, optional): seed of the sampling generator.
+        """
+        self.memory_size = memory_size
+        self.agent_ids = list(agent_ids)
+        self.device = device
+        self.arrays = SharedArrays(transition_layout(self.agent_ids, observation_spaces, action_spaces, memory_size))
+        self.rng = np.random.default_rng(seed)
+        self.pos = 0 # próxima linha a escrever
+        self.size = 0
+        self.counter = 0 # transições adicionadas desde o início
+
+    def __len__(self) -> int:
+        return self.size
+
+    def spec(self) -> tuple[str, dict]:
+        """Name and layout of the shared arrays, for `SharedArrays(layout, name=name)`"""
+        return self.arrays.spec()
+
+    def reserve(self, n: int) -> int:
+        """Claim the next n rows of the ring for a writer and count them as stored
+
+        Args:
+            n (int): number of transitions that will be written.
+
+        Returns:
+            int: first row (the rows wrap around at memory_size).
+        """
+        start = self.pos
+        self.pos = (self.pos + n) % self.memory_size
+        self.size = min(self.size + n, self.memory_size)
+        self.counter += n
+        return start
+
+    def save_to_memory(self, obs: dict, action: dict, reward: dict, next_obs: dict, done: dict,
+                       is_vectorised: bool = True) -> None:
+        """Store one (vectorized) transition
+
+        Args:
+            obs, action, reward, next_obs, done (dict): agent_id -> values, with a leading
+                num_envs axis if is_vectorised.
+            is_vectorised (bool): whether the values come from a vectorized env.
+        """
+        transition = (obs, action, reward, next_obs, done)
+        if not is_vectorised:
+            transition = tuple({agent_id: np.asarray(v)[None] for agent_id, v in values.items()}
+                               for values in transition)
+        n = len(next(iter(transition[0].values())))
+        write_transitions(self.arrays, self.reserve(n), transition)
+
+    def gather(self, indices: np.ndarray) -> tuple[dict[str, torch.Tensor], ...]:
+        """Transitions at the given rows as tensors
+
+        Args:
+            indices (np.ndarray): rows to read.
+
+        Returns:
+            tuple[dict, ...]: (obs, action, reward, next_obs, done), each agent_id -> tensor.
+        """
+        experiences = []
+        for field in FIELDS:
+            batch = {}
+            for agent_id in self.agent_ids:
+                # uma cópia (o gather) por array; o tensor é uma view dela
+                tensor = torch.from_numpy(self.arrays[f"{field}/{agent_id}"][indices])
+                batch[agent_id] = tensor if self.device is None else tensor.to(self.device)
+            experiences.append(batch)
+        return tuple(experiences)
+
+    def sample(self, batch_size: int) -> tuple[dict[str, torch.Tensor], ...]:
+        """Uniform batch of stored transitions
+
+        Args:
+            batch_size (int): number of transitions.
+
+        Returns:
+            tuple[dict, ...]: (obs, action, reward, next_obs, done), each agent_id -> tensor.
+        """
+        return self.gather(self.rng.integers(0, self.size, size=batch_size))
+
+    def close(self) -> None:
+        """Free the shared memory"""
+        self.arrays.close(unlink=True)
+
+
+class SumTree:
+    def __init__(self, capacity: int) -> None:
+        """Binary sum tree over `capacity` priorities, updated and searched in batches
+
+        Stored as an array where node i has children 2i and 2i + 1 and the leaves start at
+        `self.leaves`, so a batch update or search is one vector op per tree level.
+
+        Args:
+            capacity (int): number of leaves.
+        """
+        self.capacity = capacity
+        self.leaves = 1 << max(capacity - 1, 1).bit_length() # potência de 2, todas as folhas na mesma altura
+        self.depth = self.leaves.bit_length() - 1
+        self.tree = np.zeros(2 * self.leaves)
+
+    @property
+    def total(self) -> float:
+        """Sum of all priorities"""
+        return self.tree[1]
+
+    def update(self, indices: np.ndarray, priorities: np.ndarray) -> None:
+        """Set the priorities of a batch of leaves and refresh their ancestors
+
+        Args:
+            indices (np.ndarray): leaf indices (repeated indices keep the last priority).
+            priorities (np.ndarray): new priorities.
+        """
+        tree = self.tree
+        nodes = np.asarray(indices, dtype=np.int64) + self.leaves
+        tree[nodes] = priorities
+        for _ in range(self.depth):
+            # pais repetidos recebem o mesmo valor, então não precisa de np.unique
+            nodes >>= 1
+            children = nodes << 1
+            tree[nodes] = tree.take(children) + tree.take(children + 1)
+
+    def find(self, values: np.ndarray) -> np.ndarray:
+        """Leaves whose prefix-sum interval contains each value
+
+        Args:
+            values (np.ndarray): points in [0, total).
+
+        Returns:
+            np.ndarray: leaf indices.
+        """
+        values = np.array(values, dtype=np.float64)
+        nodes = np.ones(len(values), dtype=np.int64)
+        for _ in range(self.depth):
+            nodes <<= 1
+            left = self.tree.take(nodes)
+            right = values >= left
+            # desce para a direita descontando a massa da subárvore esquerda
+            values -= left * right
+            nodes += right
+        return np.minimum(nodes - self.leaves, self.capacity - 1)
+
+    def get(self, indices: np.ndarray) -> np.ndarray:
+        """Priorities of the given leaves"""
+        return self.tree[np.asarray(indices) + self.leaves]
+
+
+class PrioritizedReplayBuffer(SharedReplayBuffer):
+    def __init__(self, memory_size: int, agent_ids: list[str], observation_spaces: list, action_spaces: list,
+                 alpha: float = 0.6, beta: float = 0.4, beta_steps: int = 100_000, eps: float = 1e-6,
+                 device: str | torch.device | None = None, seed: int | None = None) -> None:
+        """Shared replay buffer sampling transitions in proportion to their TD error
+
+        P(i) = p_i^α / sum p^α, with new transitions getting the largest priority seen so far,
+        and importance-sampling weights (N P(i))^-β normalized by the batch maximum, with β
+        annealed linearly to 1 over `beta_steps` samples. The sum tree lives in the main
+        process; rows written by rollout workers get their priority when they are reserved.
+
+        Args:
+            memory_size (int): capacity in transitions.
+            agent_ids (list[str]): agent names.
+            observation_spaces (list): observation space of each agent.
+            action_spaces (list): action space of each agent.
+            alpha (float): how much prioritization is used (0 = uniform).
+            beta (float): initial importance-sampling exponent.
+            beta_steps (int): `sample_prioritized` calls until β reaches 1.
+            eps (float): added to |TD error| so no transition has zero priority.
+            device (str or torch.device, optional): device the sampled tensors are moved to.
+            seed (int, optional): seed of the sampling generator.
+        """
+        super().__init__(memory_size, agent_ids, observation_spaces, action_spaces, device=device, seed=seed)
+        self.alpha = alpha
+        self.beta_start = beta
+        self.beta = beta
+        self.beta_steps = beta_steps
+        self.eps = eps
+        self.tree = SumTree(memory_size)
+        self.max_priority = 1.0
+        self.sample_calls = 0
+
+    def reserve(self, n: int) -> int:
+        """Claim the next n rows, giving them the largest priority seen so far"""
+        start = super().reserve(n)
+        rows = (start + np.arange(n)) % self.memory_size
+        self.tree.update(rows, np.full(n, self.max_priority ** self.alpha))
+        return start
+
+    def sample_prioritized(self, batch_size: int) -> tuple[tuple[dict[str, torch.Tensor], ...], torch.Tensor, np.ndarray]:
+        """Batch sampled by priority, stratified over the total priority mass
+
+        Args:
+            batch_size (int): number of transitions.
+
+        Returns:
+            experiences (tuple[dict, ...]): (obs, action, reward, next_obs, done) tensors.
+            weights (torch.Tensor): importance-sampling weights, shape (batch_size, 1).
+            indices (np.ndarray): rows of the sampled transitions (for `update_priorities`).
+        """
+        total = self.tree.total
+        segment = total / batch_size
+        values = (np.arange(batch_size) + self.rng.random(batch_size)) * segment
+        indices = self.tree.find(np.minimum(values, np.nextafter(total, 0)))
+
+        probs = self.tree.get(indices) / total
+        weights = (self.size * probs) ** -self.beta
+        weights /= weights.max()
+        weights = torch.from_numpy(weights.astype(np.float32)[:, None])
+        if self.device is not None:
+            weights = weights.to(self.device)
+
+        self.sample_calls += 1
+        self.beta = min(1.0, self.beta_start + (1.0 - self.beta_start) * self.sample_calls / self.beta_steps)
+        return self.gather(indices), weights, indices
+
+    def update_priorities(self, indices: np.ndarray, td_errors: np.ndarray) -> None:
+        """Set the priorities of sampled transitions from their new TD errors
+
+        Args:
+            indices (np.ndarray): rows returned by `sample_prioritized`.
+            td_errors (np.ndarray): absolute TD error of each row.
+        """
+        priorities = np.abs(td_errors) + self.eps
+        self.max_priority = max(self.max_priority, float(priorities.max()))
+        self.tree.update(indices, priorities ** self.alpha)
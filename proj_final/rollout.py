@@ -0,0 +1,131 @@
+"""Parallel rollout collection for the MATD3 population.
+
+Each worker process owns its own vectorized env and collects the transitions of one
+population member at a time straight into the shared-memory replay buffer, so the main
+process only has to learn.
+"""
+
+from agilerl.utils.utils import make_multi_agent_vect_envs
+
+from episodes import EpisodeTracker
+from replay_buffer import SharedArrays, write_transitions
+from workers import WorkerPool, load_policy_state, policy_state
+
+
+def count_learn_calls(agent, n_steps: int, num_envs: int) -> int:
+    """Number of agent.learn calls the serial loop makes over n_steps vectorized steps
+
+    Args:
+        agent (MATD3): population member (uses its learn_step).
+        n_steps (int): vectorized steps collected.
+        num_envs (int): envs per vectorized step.
+
+    Returns:
+        int: learn calls.
+    """
+    # learn_step > num_envs: um learn a cada learn_step // num_envs passos
+    if agent.learn_step > num_envs:
+        every = agent.learn_step // num_envs
+        return -(-n_steps // every)
+    # senão, vários learns por passo
+    return n_steps * (num_envs // agent.learn_step)
+
+
+def _collect(agent, env, memory: SharedArrays, start: int, n_steps: int, step_offset: int,
+             noise: tuple[float, float, float]) -> list[float]:
+    """Run one member for n_steps vectorized steps, writing its transitions to the replay rows from start
+
+    Same steps as the serial loop of main.py without the learning: exploration noise decayed
+    on the global step count and episode scores summed over the agents.
+
+    Returns:
+        list[float]: scores of the episodes completed during the rollout.
+    """
+    noise_start, noise_end, noise_decay = noise
+    num_envs = env.num_envs
+    capacity = len(memory[f"done/{agent.agent_ids[0]}"])
+    agent.set_training_mode(True)
+    obs, info = env.reset()
+    episodes = EpisodeTracker(num_envs, agent.agent_ids)
+    for t in range(n_steps):
+        action, raw_action = agent.get_action(obs=obs, infos=info)
+        next_obs, reward, termination, truncation, info = env.step(action)
+
+        decay_progress = min((step_offset + t * num_envs) / noise_decay, 1.0)
+        agent.EXPL_NOISE = noise_start + decay_progress * (noise_end - noise_start)
+
+        write_transitions(memory, (start + t * num_envs) % capacity, (obs, raw_action, reward, next_obs, termination))
+        obs = next_obs
+        agent.reset_action_noise(episodes.step(reward, termination, truncation))
+    return episodes.drain()["score"].tolist()
+
+
+class _RolloutWorker:
+    def __init__(self, make_env, make_agent, num_envs: int) -> None:
+        """Per-process rollout state: a vectorized env and an agent that loads each member's policy"""
+        self.env = make_multi_agent_vect_envs(env=make_env, num_envs=num_envs)
+        self.agent = make_agent()
+        self.attached: dict[str, SharedArrays] = {}
+
+    def __call__(self, task: tuple) -> list[float]:
+        policy, (name, layout), start, n_steps, step_offset, noise = task
+        load_policy_state(self.agent, policy)
+        if name not in self.attached:
+            self.attached[name] = SharedArrays(layout, name=name)
+        return _collect(self.agent, self.env, self.attached[name], start, n_steps, step_offset, noise)
+
+    def close(self) -> None:
+        for arrays in self.attached.values():
+            arrays.close()
+        self.env.close()
+
+
+class ParallelRollout:
+    def __init__(self, make_env, make_agent, num_envs: int, num_workers: int, n_steps: int,
+                 timeout: float | None = None) -> None:
+        """Pool of rollout workers collecting the population's transitions concurrently
+
+        Workers pull population members from a task queue, so all of them are collected
+        concurrently with up to `num_workers` at a time, each writing to its own range of
+        replay buffer rows. Each worker builds one agent with `make_agent` and loads into it
+        the actor weights and noise each member had when `collect` was called.
+
+        Args:
+            make_env (callable): picklable env constructor (a module-level function).
+            make_agent (callable): picklable constructor of a CPU agent with the population's
+                spaces and noise settings.
+            num_envs (int): envs in each worker's vectorized env.
+            num_workers (int): worker processes.
+            n_steps (int): vectorized steps per member and call.
+            timeout (float, optional): seconds `collect` waits for the workers (None = no limit).
+        """
+        self.num_envs = num_envs
+        self.n_steps = n_steps
+        self.pool = WorkerPool(_RolloutWorker, (make_env, make_agent, num_envs), num_workers, timeout)
+
+    def collect(self, pop: list, memory, step_offset: int, noise: tuple[float, float, float]) -> list[list[float]]:
+        """Collect n_steps vectorized steps for every member of the population into memory
+
+        Args:
+            pop (list): population.
+            memory (SharedReplayBuffer): replay buffer the workers write to.
+            step_offset (int): global env step count before the first member, for the noise decay.
+            noise (tuple): (noise_start, noise_end, noise_decay) of the exploration schedule.
+
+        Returns:
+            list[list[float]]: per member, the scores of its completed episodes.
+
+        Raises:
+            WorkerError: a rollout failed or a worker exited.
+        """
+        steps_per_member = self.n_steps * self.num_envs
+        # cada membro segue a decaída de ruído como se fosse coletado em sequência
+        return self.pool.map([
+            (policy_state(agent), memory.spec(), memory.reserve(steps_per_member), self.n_steps,
+             step_offset + index * steps_per_member, noise)
+            for index, agent in enumerate(pop)
+        ])
+
+    def close(self) -> None:
+        """Stop the workers"""
+        self.pool.close()
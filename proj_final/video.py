@@ -0,0 +1,153 @@
+"""Streaming GIF/video writing for replays: frames are encoded as they arrive, not kept in memory."""
+
+import os
+import queue
+import threading
+
+import imageio
+import numpy as np
+from PIL import GifImagePlugin, Image, ImageDraw
+
+
+class EpisodeLabel:
+    def __init__(self, frame: np.ndarray, episode_num: int) -> None:
+        """Episode number overlay, rendered once and blended into every frame of the episode
+
+        The text is drawn once into a small alpha mask; labeling a frame is then a blend of
+        that patch, rounded like Pillow's, instead of a PIL image and ImageDraw per frame.
+        As with ImageDraw, the text is white on dark frames and black on light ones.
+
+        Args:
+            frame (np.ndarray): first rgb frame of the episode, shape (H, W, 3) (sets the frame size).
+            episode_num (int): episode index (shown 1-based).
+        """
+        height, width = frame.shape[:2]
+        position = (width / 20, height / 18)
+        text = f"Episode: {episode_num+1}"
+        mask = Image.new("L", (width, height))
+        drawer = ImageDraw.Draw(mask)
+        drawer.text(position, text, fill=255)
+        x0, y0, x1, y1 = (int(v) for v in drawer.textbbox(position, text))
+        x0, y0, x1, y1 = max(x0, 0), max(y0, 0), min(x1 + 1, width), min(y1 + 1, height)
+        self.region = (slice(y0, y1), slice(x0, x1))
+        self.alpha = (np.asarray(mask)[self.region] / 255.0)[..., None]
+
+    def apply(self, frame: np.ndarray) -> np.ndarray:
+        """Blend the label into the frame in place
+
+        Args:
+            frame (np.ndarray): rgb frame of the episode, shape (H, W, 3), uint8.
+
+        Returns:
+            np.ndarray: the same frame.
+        """
+        color = 255.0 if np.mean(frame) < 128 else 0.0
+        patch = frame[self.region]
+        patch[...] = np.rint(patch + self.alpha * (color - patch))
+        return frame
+
+
+class GifStreamWriter:
+    def __init__(self, path: str, duration: float = 10, loop: int = 0) -> None:
+        """Animated GIF written frame by frame
+
+        Each frame is quantized to an adaptive palette and appended to the file with its
+        own color table, using Pillow's GIF frame encoder, so memory does not grow with the
+        number of frames. Same interface as an imageio writer (append_data/close).
+
+        Args:
+            path (str): output .gif path.
+            duration (float): display time of each frame in ms.
+            loop (int): times to loop (0 = forever).
+        """
+        self.duration = duration
+        self.loop = loop
+        self.file = open(path, "wb")
+        self.count = 0
+
+    def append_data(self, frame: np.ndarray) -> None:
+        """Encode one rgb frame, shape (H, W, 3)"""
+        im = Image.fromarray(frame).convert("P", palette=Image.Palette.ADAPTIVE)
+        if self.count == 0:
+            # paleta global do primeiro quadro; cada quadro leva a sua própria tabela local
+            header, _ = GifImagePlugin.getheader(im, info={"loop": self.loop, "duration": self.duration})
+            self.file.write(b"".join(header))
+        for data in GifImagePlugin.getdata(im, duration=self.duration, include_color_table=True):
+            self.file.write(data)
+        self.count += 1
+
+    def close(self) -> None:
+        """Write the GIF trailer and close the file"""
+        if not self.file.closed:
+            self.file.write(b";")
+            self.file.close()
+
+    def __enter__(self) -> 'GifStreamWriter':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+class FrameWriter:
+    def __init__(self, path: str, duration: float = 10, threaded: bool = True, queue_size: int = 64) -> None:
+        """Streams frames to a .gif (GifStreamWriter) or a video file (imageio writer, e.g. .mp4)
+
+        With threaded=True frames are encoded by a background thread fed through a queue
+        of at most `queue_size` frames: rendering and encoding overlap, and `append`
+        blocks when the encoder falls behind, which bounds memory.
+
+        Args:
+            path (str): output path; the extension selects the format.
+            duration (float): display time of each frame in ms.
+            threaded (bool): encode in a background thread.
+            queue_size (int): frames waiting to be encoded at most.
+        """
+        if os.path.splitext(path)[1].lower() == ".gif":
+            self.writer = GifStreamWriter(path, duration=duration)
+        else:
+            self.writer = imageio.get_writer(path, fps=1000 / duration)
+        self.frames = 0
+        self._error: BaseException | None = None
+        self._queue = None
+        self._thread = None
+        if threaded:
+            self._queue = queue.Queue(maxsize=queue_size)
+            self._thread = threading.Thread(target=self._encode, daemon=True)
+            self._thread.start()
+
+    def _encode(self) -> None:
+        """Background thread: encode queued frames until None"""
+        while (frame := self._queue.get()) is not None:
+            if self._error is None:
+                try:
+                    self.writer.append_data(frame)
+                except BaseException as error:
+                    self._error = error # relançado na thread principal
+            # continua consumindo para o produtor nunca travar na fila cheia
+
+    def append(self, frame: np.ndarray) -> None:
+        """Queue (or encode right away) one rgb frame"""
+        if self._error is not None:
+            raise self._error
+        if self._queue is None:
+            self.writer.append_data(frame)
+        else:
+            self._queue.put(frame)
+        self.frames += 1
+
+    def close(self) -> None:
+        """Encode the remaining frames and close the file"""
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+        self.writer.close()
+        if self._error is not None:
+            raise self._error
+
+    def __enter__(self) -> 'FrameWriter':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
@@ -0,0 +1,182 @@
+"""Worker process pool shared by the rollout and evaluation pools.
+
+Each worker builds its long-lived state (vectorized env, acting agent) once and then
+serves tasks from a queue. Failures in a worker come back to the main process as
+WorkerError instead of leaving it waiting forever on the results queue. Population
+members are sent as `policy_state`, their actor weights and exploration noise, and
+loaded into the worker's own agent.
+"""
+
+import multiprocessing as mp
+import queue
+import traceback
+
+import torch
+
+
+class WorkerError(RuntimeError):
+    """A task failed in a worker process, or a worker exited"""
+
+
+def policy_state(agent) -> dict:
+    """What a worker needs to act as the agent, on the CPU
+
+    The actors are sent as (class, init_dict, state_dict), so architecture and activation
+    mutations reach the workers, plus the exploration noise tensors. The critics, optimizers
+    and RL hyperparameters are left out: get_action does not use them. Actors of a
+    torch.compile'd agent are unwrapped and sent with clip_actions=True, so the worker's
+    uncompiled agent rescales the actions inside the forward pass, where the compiled agent
+    rescales them after it.
+
+    Args:
+        agent (MATD3): population member.
+
+    Returns:
+        dict: {"actors": agent_id -> (class, init_dict, state_dict), "noise": name -> agent_id -> tensor}.
+    """
+    actors = {}
+    for agent_id, actor in agent.actors.items():
+        actor = getattr(actor, "_orig_mod", actor) # desfaz o wrapper do torch.compile
+        init_dict = dict(actor.init_dict)
+        if "device" in init_dict:
+            init_dict["device"] = "cpu"
+        if getattr(agent, "torch_compiler", None) is not None and "clip_actions" in init_dict:
+            init_dict["clip_actions"] = True
+        weights = {name: tensor.detach().cpu() for name, tensor in actor.state_dict().items()}
+        actors[agent_id] = (type(actor), init_dict, weights)
+    noise = {
+        name: {agent_id: tensor.cpu() for agent_id, tensor in getattr(agent, name).items()}
+        for name in ("expl_noise", "mean_noise", "current_noise")
+    }
+    return {"actors": actors, "noise": noise}
+
+
+def load_policy_state(agent, state: dict) -> None:
+    """Make a worker's agent act as the member `state` was taken from
+
+    Actors are rebuilt only when the member's architecture differs from the current one,
+    otherwise the weights are loaded in place.
+
+    Args:
+        agent (MATD3): the worker's agent (on the CPU).
+        state (dict): output of `policy_state`.
+    """
+    for agent_id, (cls, init_dict, weights) in state["actors"].items():
+        actor = agent.actors[agent_id]
+        current = dict(actor.init_dict)
+        if "device" in current:
+            current["device"] = "cpu"
+        if type(actor) is not cls or current != init_dict:
+            actor = cls(**init_dict)
+            agent.actors[agent_id] = actor
+        actor.load_state_dict(weights)
+    for name, tensors in state["noise"].items():
+        setattr(agent, name, {agent_id: tensor.clone() for agent_id, tensor in tensors.items()})
+
+
+def _serve(make_worker, args: tuple, tasks, results) -> None:
+    """Worker loop: builds its worker once and runs tasks until it gets None
+
+    Every result is (call, index, ok, value); a failed task sends its traceback as value
+    and the worker keeps serving.
+    """
+    # um processo por worker já paraleliza; threads do torch só competiriam pelos núcleos
+    torch.set_num_threads(1)
+    try:
+        worker = make_worker(*args)
+    except Exception:
+        results.put((None, None, False, traceback.format_exc()))
+        return
+    try:
+        while (task := tasks.get()) is not None:
+            call, index, payload = task
+            try:
+                results.put((call, index, True, worker(payload)))
+            except Exception:
+                results.put((call, index, False, traceback.format_exc()))
+    finally:
+        worker.close()
+
+
+class WorkerPool:
+    def __init__(self, make_worker, args: tuple, num_workers: int, timeout: float | None = None,
+                 poll_interval: float = 1.0) -> None:
+        """Spawned worker processes running the tasks of `map` concurrently
+
+        Each process calls `make_worker(*args)` once; the returned object is called with
+        each task payload and closed when the pool stops.
+
+        Args:
+            make_worker (callable): picklable worker constructor (a module-level class or function).
+            args (tuple): picklable constructor arguments.
+            num_workers (int): worker processes.
+            timeout (float, optional): seconds `map` waits for the next result (None = as long
+                as all workers are alive).
+            poll_interval (float): seconds between checks that the workers are still alive.
+        """
+        self.timeout = timeout
+        self.poll_interval = poll_interval
+        self.calls = 0 # numera as chamadas de map, para descartar resultados de uma chamada que falhou
+        ctx = mp.get_context("spawn")
+        self.tasks = ctx.Queue()
+        self.results = ctx.Queue()
+        # não-daemon: cada worker cria os subprocessos do seu próprio vectorized env
+        self.workers = [
+            ctx.Process(target=_serve, args=(make_worker, args, self.tasks, self.results))
+            for _ in range(num_workers)
+        ]
+        for worker in self.workers:
+            worker.start()
+
+    def map(self, payloads: list) -> list:
+        """Run every payload on the workers and return the results in order
+
+        Raises:
+            WorkerError: a task raised (with the worker's traceback), a worker exited, or
+                the timeout expired; tasks not started yet are dropped.
+        """
+        self.calls += 1
+        for index, payload in enumerate(payloads):
+            self.tasks.put((self.calls, index, payload))
+        completed = {}
+        waited = 0.0
+        while len(completed) < len(payloads):
+            try:
+                call, index, ok, value = self.results.get(timeout=self.poll_interval)
+            except queue.Empty:
+                waited += self.poll_interval
+                dead = [worker for worker in self.workers if not worker.is_alive()]
+                if dead:
+                    self._drop_tasks()
+                    raise WorkerError(f"worker process {dead[0].pid} exited with code {dead[0].exitcode}")
+                if self.timeout is not None and waited >= self.timeout:
+                    self._drop_tasks()
+                    raise WorkerError(f"no result from the workers for {self.timeout}s")
+                continue
+            if call not in (None, self.calls):
+                continue
+            if not ok:
+                self._drop_tasks()
+                where = "starting a worker" if index is None else f"task {index}"
+                raise WorkerError(f"{where} failed in a worker process:\n{value}")
+            completed[index] = value
+            waited = 0.0
+        return [completed[index] for index in range(len(payloads))]
+
+    def _drop_tasks(self) -> None:
+        """Discard queued tasks, so close() does not wait for them"""
+        try:
+            while True:
+                self.tasks.get_nowait()
+        except queue.Empty:
+            pass
+
+    def close(self, timeout: float = 30.0) -> None:
+        """Stop the workers, terminating those that do not exit within timeout seconds"""
+        for _ in self.workers:
+            self.tasks.put(None)
+        for worker in self.workers:
+            worker.join(timeout)
+            if worker.is_alive():
+                worker.terminate()
+                worker.join()